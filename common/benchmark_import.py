@@ -0,0 +1,91 @@
+import argparse
+import os
+import subprocess
+import sys
+
+
+root_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# (目錄, 模組)
+modules = [
+    ("common", "sink"),
+    ("cwa", "cwa"),
+    ("dgbas", "dgbas"),
+    ("dgbas", "population_and_housing_census"),
+    ("moenv", "etl_moenv"),
+    ("singapore", "SG_environ"),
+    ("singapore", "sg_realestate"),
+    ("tourism", "hotel"),
+    ("tourism", "tourism"),
+]
+
+# 應該等到用到時才 import 的套件
+heavy = ["pandas", "numpy", "bs4", "pdfplumber", "pytz", "pyarrow", "python_calamine"]
+
+
+def import_time(dir_name, module, prelude=""):
+    # 每次都開新的 python，用 -X importtime 取該模組的累計時間(微秒)
+    code = (
+        f"import sys; sys.path.insert(0, {os.path.join(root_dir, dir_name)!r}); "
+        f"{prelude}import {module}; "
+        f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True,
+        text=True,
+    )
+
+    if result.returncode != 0:
+        return None, result.stderr.strip().splitlines()[-1]
+
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        fields = line.split("|")
+
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]), result.stdout.strip()
+
+    return None, "not found"
+
+
+def benchmark(repeat):
+    print("Heavy libraries (eager baseline):")
+
+    for module in heavy:
+        times = [import_time("common", module)[0] for _ in range(repeat)]
+
+        if None not in times:
+            print(f"  {module}: {min(times) / 1000:.1f} ms")
+
+    print("Crawler modules:")
+
+    for dir_name, module in modules:
+        results = [import_time(dir_name, module) for _ in range(repeat)]
+        times = [elapsed for elapsed, _ in results]
+
+        if None in times:
+            print(f"  {module}: failed ({results[0][1]})")
+            continue
+
+        loaded = results[0][1] or "-"
+        print(f"  {module}: {min(times) / 1000:.1f} ms, heavy loaded: {loaded}")
+
+    # DAG 解析: airflow 本身不算，只看 dag 檔案的累計時間
+    elapsed, loaded = import_time(
+        "moenv", "dag_moenv", "import airflow.operators.python; "
+    )
+
+    if elapsed is None:
+        print(f"DAG parse: skipped ({loaded})")
+
+    else:
+        print(f"DAG parse: {elapsed / 1000:.1f} ms, heavy loaded: {loaded or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    benchmark(args.repeat)
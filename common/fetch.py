@@ -0,0 +1,175 @@
+import os
+import json
+import hashlib
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util import Retry, make_headers
+
+
+# (connect, read) 秒數
+DEFAULT_TIMEOUT = (10, 60)
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    def __init__(self, timeout=DEFAULT_TIMEOUT, **kwargs):
+        self.timeout = timeout
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+
+        return super().send(request, **kwargs)
+
+
+class RateLimiter:
+    # 多執行緒共用，讓請求間隔至少 1 / rate 秒；rate 為 None 時不限制
+    def __init__(self, rate=None):
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.next_time = 0
+
+    def wait(self):
+        if not self.rate:
+            return
+
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + 1 / self.rate
+
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def get_session(
+    timeout=DEFAULT_TIMEOUT,
+    retries=3,
+    backoff_factor=1,
+    pool_connections=10,
+    pool_maxsize=10,
+):
+    # 失敗時等待 backoff_factor * (2 ** (n - 1)) 秒後重試
+    retry = Retry(
+        total=retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=None,  # DGBAS ShowQuery 的 POST 也是查詢，可重試
+        raise_on_status=False,
+    )
+
+    # 每個 host 一個 keep-alive 連線池，最多保留 pool_connections 個 host
+    adapter = TimeoutHTTPAdapter(
+        timeout=timeout,
+        max_retries=retry,
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+    )
+
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    # 有安裝 brotli 時會帶 br
+    session.headers.update(make_headers(accept_encoding=True))
+
+    return session
+
+
+# 所有爬蟲共用的 session
+session = get_session()
+
+
+def configure(**kwargs):
+    global session
+    session.close()
+    session = get_session(**kwargs)
+    return session
+
+
+def get(url, **kwargs):
+    return session.get(url, **kwargs)
+
+
+def request(method, url, **kwargs):
+    return session.request(method, url, **kwargs)
+
+
+# 條件式請求快取: {cache_path: {sha256(url): {"etag", "last_modified", "sha256"}}}
+# url 可能含 api key，只存 hash
+caches = {}
+cache_lock = threading.Lock()
+
+
+def load_cache(cache_path):
+    if cache_path not in caches:
+        caches[cache_path] = {}
+
+        if os.path.exists(cache_path):
+            with open(cache_path) as f:
+                caches[cache_path] = json.load(f)
+
+    return caches[cache_path]
+
+
+def get_if_changed(url, cache_path="fetch_cache.json", force=False, **kwargs):
+    # 沒有更新時回傳 None，呼叫端不需要解析
+    key = hashlib.sha256(url.encode()).hexdigest()
+
+    with cache_lock:
+        entry = load_cache(cache_path).get(key, {})
+
+    headers = dict(kwargs.pop("headers", None) or {})
+
+    if not force:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+    response = session.get(url, headers=headers, **kwargs)
+
+    if response.status_code == 304:
+        print("Not modified (304).")
+        return None
+
+    if response.status_code != 200:
+        return response
+
+    # 伺服器沒有 ETag/Last-Modified 時，比對內容 hash
+    body_hash = hashlib.sha256(response.content).hexdigest()
+
+    if not force and body_hash == entry.get("sha256"):
+        print("Not modified (same content).")
+        return None
+
+    response.cache_entry = (
+        cache_path,
+        key,
+        {
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "sha256": body_hash,
+        },
+    )
+
+    return response
+
+
+def commit(response):
+    # 資料存檔成功後才記錄，失敗時下次仍會重新抓取
+    cache_path, key, entry = response.cache_entry
+
+    with cache_lock:
+        cache = load_cache(cache_path)
+        cache[key] = entry
+
+        os.makedirs(os.path.dirname(cache_path) or ".", exist_ok=True)
+
+        with open(f"{cache_path}.part", "w") as f:
+            json.dump(cache, f, indent=4)
+
+        os.replace(f"{cache_path}.part", cache_path)
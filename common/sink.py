@@ -0,0 +1,134 @@
+import os
+import re
+
+
+# 輸出格式 -> 副檔名
+FORMATS = {"csv": ".csv", "parquet": ".parquet", "feather": ".feather"}
+
+# 預設輸出格式可用環境變數 OUTPUT_FORMAT 設定(ProcessPool 的子行程也適用)
+options = {
+    "format": os.environ.get("OUTPUT_FORMAT", "csv"),
+    "compression": "zstd",  # Parquet/Feather
+}
+
+
+def configure(**kwargs):
+    if kwargs.get("format", options["format"]) not in FORMATS:
+        raise ValueError(f"Unknown output format: {kwargs['format']}")
+
+    options.update(kwargs)
+
+
+def get_path(path, format=None):
+    # 依輸出格式換副檔名: data/a.csv -> data/a.parquet
+    return os.path.splitext(path)[0] + FORMATS[format or options["format"]]
+
+
+def to_arrow_compatible(df):
+    import pandas as pd
+
+    # Arrow 一欄只能有一種型別，混合型別(例如數字和字串)的 object 欄位轉成字串
+    columns = {}
+
+    for column in df.columns[df.dtypes == object]:
+        inferred = pd.api.types.infer_dtype(df[column], skipna=True)
+
+        if inferred.startswith("mixed"):
+            columns[column] = df[column].where(
+                df[column].isna(), df[column].astype(str)
+            )
+
+    return df.assign(**columns) if columns else df
+
+
+def get_partition_dir(root, partition_cols, keys):
+    import pandas as pd
+
+    keys = keys if isinstance(keys, tuple) else (keys,)
+    dir_names = []
+
+    for col, key in zip(partition_cols, keys):
+        value = "" if pd.isna(key) else re.sub(r"[\\/]", "_", str(key))
+        dir_names.append(f"{col}={value}")
+
+    return os.path.join(root, *dir_names)
+
+
+def read(path, format=None, columns=None):
+    import pandas as pd
+
+    format = format or options["format"]
+
+    if format == "csv":
+        return pd.read_csv(path, usecols=columns)
+
+    elif format == "parquet":
+        return pd.read_parquet(path, columns=columns)
+
+    elif format == "feather":
+        return pd.read_feather(path, columns=columns)
+
+
+def write_file(df, path, format, append=False, **csv_kwargs):
+    import pandas as pd
+
+    if format == "csv" and append:
+        header = not os.path.exists(path)
+        df.to_csv(path, mode="a", header=header, index=False, **csv_kwargs)
+        return
+
+    # Parquet/Feather 不能附加，讀出舊資料合併後整份重寫
+    if append and os.path.exists(path):
+        df = pd.concat([read(path, format), df], ignore_index=True)
+
+    # 先寫到暫存檔再改名，中斷時不會留下不完整的檔案
+    part_path = f"{path}.part"
+
+    if format == "csv":
+        df.to_csv(part_path, index=False, **csv_kwargs)
+
+    elif format == "parquet":
+        to_arrow_compatible(df).to_parquet(
+            part_path, index=False, compression=options["compression"]
+        )
+
+    elif format == "feather":
+        to_arrow_compatible(df).reset_index(drop=True).to_feather(
+            part_path, compression=options["compression"]
+        )
+
+    os.replace(part_path, path)
+
+
+def write(df, path, format=None, partition_cols=None, append=False, **csv_kwargs):
+    format = format or options["format"]
+    path = get_path(path, format)
+
+    if not partition_cols:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        write_file(df, path, format, append, **csv_kwargs)
+        return path
+
+    # Hive 分區: data/a.parquet -> data/a/<col>=<value>/a.parquet
+    root, ext = os.path.splitext(path)
+    name = os.path.basename(root)
+
+    for keys, df_partition in df.groupby(
+        partition_cols, sort=False, observed=True, dropna=False
+    ):
+        partition_dir = get_partition_dir(root, partition_cols, keys)
+        os.makedirs(partition_dir, exist_ok=True)
+
+        # 分區欄位已在路徑裡，Arrow 格式不重複存；CSV 保留完整欄位
+        if format != "csv":
+            df_partition = df_partition.drop(columns=partition_cols)
+
+        write_file(
+            df_partition,
+            os.path.join(partition_dir, f"{name}{ext}"),
+            format,
+            append,
+            **csv_kwargs,
+        )
+
+    return root
@@ -0,0 +1,75 @@
+import argparse
+import json
+import os
+import timeit
+import pandas as pd
+
+from cwa import json_to_df
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# 舊版做法：每個測站 pd.concat 一次，並逐列解析欄位路徑
+def json_to_df_concat(fields, json_data):
+    df = pd.DataFrame()
+
+    for station in json_data["Station"]:
+        row = {}
+
+        for field in fields:
+            value = station
+
+            for path in field.split("-"):
+                value = value[path]
+
+                if path == "Coordinates":
+                    value = value[1]  # [0]: TWD67, [1]: WGS84
+
+            row[field] = value
+
+        df = pd.concat([df, pd.DataFrame([row])])
+
+    return df
+
+
+def benchmark(config_path, dataset_name_ch, payload_path, repeat=5):
+    with open(config_path) as file:
+        fields = json.load(file)["datasets"][dataset_name_ch]["fields"]
+
+    # 錄製的 API 回應（完整 response.json()）
+    with open(payload_path) as file:
+        json_data = json.load(file)["records"]
+
+    # 確認兩者輸出相同
+    df_old = json_to_df_concat(fields, json_data).reset_index(drop=True)
+    df_new = json_to_df(fields, json_data)
+    pd.testing.assert_frame_equal(df_old, df_new, check_dtype=False)
+
+    old = min(
+        timeit.repeat(
+            lambda: json_to_df_concat(fields, json_data), number=1, repeat=repeat
+        )
+    )
+    new = min(
+        timeit.repeat(lambda: json_to_df(fields, json_data), number=1, repeat=repeat)
+    )
+
+    print(f"Stations: {len(json_data['Station'])}")
+    print(f"pd.concat per station: {old:.4f}s")
+    print(f"Compiled accessors:    {new:.4f}s ({old / new:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "payload_path", nargs="?", default=os.path.join(fixture_dir, "O-A0001-001.json")
+    )
+    parser.add_argument(
+        "--config",
+        default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "cwa.json"),
+    )
+    parser.add_argument("--dataset", default="自動氣象站-氣象觀測資料")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    benchmark(args.config, args.dataset, args.payload_path, args.repeat)
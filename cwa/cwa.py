@@ -1,13 +1,24 @@
-import requests
 import json
-import pandas as pd
 from datetime import datetime, timezone, timedelta
 import os
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
 
 
 # Define config as a global variable
 config = {}
 
+# 附加模式：快照依觀測日期分區附加成小檔，過去日期的小檔再合併成一個
+store_format = "parquet"
+store_lock = threading.Lock()
+
 
 def load_config(config_path):
     global config
@@ -15,71 +26,108 @@ def load_config(config_path):
         config = json.load(file)
 
 
-def json_to_df(fields, json_data):
-    df = pd.DataFrame()
+def compile_fields(fields):
+    # "GeoInfo-Coordinates-StationLatitude" -> ("GeoInfo", "Coordinates", 1, "StationLatitude")
+    accessors = []
 
-    for station in json_data["Station"]:
-        row = {}
+    for field in fields:
+        keys = []
 
-        for field in fields:
-            value = station
+        for path in field.split("-"):
+            keys.append(path)
 
-            for path in field.split("-"):
-                value = value[path]
+            if path == "Coordinates":
+                keys.append(1)  # [0]: TWD67, [1]: WGS84
 
-                if path == "Coordinates":
-                    value = value[1]  # [0]: TWD67, [1]: WGS84
+        accessors.append((field, tuple(keys)))
 
-            row[field] = value
+    return accessors
 
-        df = pd.concat([df, pd.DataFrame([row])])
 
-    return df
+def json_to_df(fields, json_data):
+    import pandas as pd
+
+    accessors = compile_fields(fields)
+    columns = {field: [] for field in fields}
+
+    for station in json_data["Station"]:
+        for field, keys in accessors:
+            value = station
+
+            for key in keys:
+                value = value[key]
+
+            columns[field].append(value)
+
+    return pd.DataFrame(columns, columns=fields)
 
 
 def json_to_df_uv(json_data):
-    df = pd.DataFrame()
+    import pandas as pd
+
+    locations = json_data["weatherElement"]["location"]
 
-    for location in json_data["weatherElement"]["location"]:
-        row = {
-            "StationID": location["StationID"],
-            "UVIndex": location["UVIndex"],
+    return pd.DataFrame(
+        {
+            "StationID": [location["StationID"] for location in locations],
+            "UVIndex": [location["UVIndex"] for location in locations],
             "Date": json_data["weatherElement"]["Date"],
         }
+    )
 
-        df = pd.concat([df, pd.DataFrame([row])])
 
-    return df
+def count_rejected(mask):
+    counts = mask.sum()
+    return {col: int(count) for col, count in counts.items() if count > 0}
 
 
 def process_99(df):
-    df.reset_index(drop=True, inplace=True)
+    df = df.reset_index(drop=True)
 
-    for index, row in df.iterrows():
-        for col in df.columns:
-            if str(row[col]) in ["-99", "-99.0"]:
-                print(
-                    f"Invalid: Row index: {index}, Column name: {col}, Value: {row[col]}"
-                )
-                df.at[index, col] = None
+    # -99 / -99.0 為無效值
+    mask = df.astype(str).isin(["-99", "-99.0"])
+    df = df.mask(mask)
 
-    return df
+    return df, count_rejected(mask)
 
 
 def process_date(df):
-    df.reset_index(drop=True, inplace=True)
+    import pandas as pd
+
+    df = df.reset_index(drop=True)
     date_columns = [col for col in df.columns if "Date" in col]
 
-    for index, row in df.iterrows():
-        for col in date_columns:
-            try:
-                pd.to_datetime(row[col].split("T")[0], format="%Y-%m-%d")
+    if not date_columns:
+        return df, {}
 
-            except (ValueError, AttributeError):
-                print(f"Invalid date: Row {index}, Column {col}: {row[col]}\n")
-                df.at[index, col] = None
+    # 所有日期欄位攤平成一個Series，只呼叫一次to_datetime
+    values = pd.Series(df[date_columns].to_numpy().ravel(), dtype=object)
+    dates = values.str.split("T").str[0]
+    parsed = pd.to_datetime(dates, format="%Y-%m-%d", errors="coerce")
 
-    return df
+    shape = (len(df), len(date_columns))
+    invalid = pd.DataFrame(
+        parsed.isna().to_numpy().reshape(shape), columns=date_columns
+    )
+    df[date_columns] = df[date_columns].mask(invalid)
+
+    # 原本就是空值的不計入
+    rejected = invalid & values.notna().to_numpy().reshape(shape)
+
+    return df, count_rejected(rejected)
+
+
+def clean_df(df):
+    df, rejected_99 = process_99(df)
+    df, rejected_date = process_date(df)
+
+    rejected = {}
+
+    for counts in [rejected_99, rejected_date]:
+        for col, count in counts.items():
+            rejected[col] = rejected.get(col, 0) + count
+
+    return df, rejected
 
 
 def process_col_names(df, length_limit=30):
@@ -98,7 +146,108 @@ def process_col_names(df, length_limit=30):
     return df
 
 
-def crawler(config_path, dataset_name_ch):
+def get_store_keys(df):
+    # (測站, 觀測時間) 為唯一鍵；紫外線的測站欄位是 StationID，且只有日期
+    station_column = "StationId" if "StationId" in df.columns else "StationID"
+    time_column = "ObsTime-DateTime" if "ObsTime-DateTime" in df.columns else "Date"
+    return [station_column, time_column]
+
+
+def get_part_paths(partition_dir):
+    if not os.path.isdir(partition_dir):
+        return []
+
+    ext = sink.FORMATS[store_format]
+
+    return sorted(
+        os.path.join(partition_dir, file_name)
+        for file_name in os.listdir(partition_dir)
+        if file_name.endswith(ext)
+    )
+
+
+def read_partition(partition_dir, columns=None):
+    import pandas as pd
+
+    dfs = [
+        sink.read(part_path, store_format, columns)
+        for part_path in get_part_paths(partition_dir)
+    ]
+
+    return pd.concat(dfs, ignore_index=True) if dfs else None
+
+
+def append_to_store(df, store_dir, now):
+    import pandas as pd
+
+    keys = get_store_keys(df)
+    df = df.drop_duplicates(keys)
+
+    # 觀測時間的日期作為分區，e.g. store/date=2024-12-09/
+    dates = df[keys[1]].str[:10].fillna("")
+
+    appended = 0
+
+    for date, df_date in df.groupby(dates, sort=False):
+        partition_dir = sink.get_partition_dir(store_dir, ["date"], date)
+
+        with store_lock:
+            # 上次之後沒有更新的測站(ObsTime 相同)不重複存
+            df_existing = read_partition(partition_dir, keys)
+
+            if df_existing is not None:
+                existing = pd.MultiIndex.from_frame(df_existing)
+                df_date = df_date[
+                    ~pd.MultiIndex.from_frame(df_date[keys]).isin(existing)
+                ]
+
+            if df_date.empty:
+                continue
+
+            os.makedirs(partition_dir, exist_ok=True)
+            part_path = os.path.join(
+                partition_dir, f"part-{now}{sink.FORMATS[store_format]}"
+            )
+            sink.write_file(df_date, part_path, store_format)
+            appended += len(df_date)
+
+    print(f"Appended {appended} new row(s), skipped {len(df) - appended}.")
+
+
+def compact_store(store_dir, today):
+    if not os.path.isdir(store_dir):
+        return
+
+    for dir_name in sorted(os.listdir(store_dir)):
+        partition_dir = os.path.join(store_dir, dir_name)
+
+        # 當天的分區還會繼續附加，不合併
+        if dir_name == f"date={today}":
+            continue
+
+        with store_lock:
+            part_paths = get_part_paths(partition_dir)
+
+            if len(part_paths) <= 1:
+                continue
+
+            df = read_partition(partition_dir)
+            keys = get_store_keys(df)
+            df = df.drop_duplicates(keys).sort_values(keys, ignore_index=True)
+
+            compacted_path = os.path.join(
+                partition_dir, f"compacted{sink.FORMATS[store_format]}"
+            )
+            sink.write_file(df, compacted_path, store_format)
+
+            for part_path in part_paths:
+                if part_path != compacted_path:
+                    os.remove(part_path)
+
+        print(f"Compacted {len(part_paths)} files: {partition_dir}")
+
+
+def crawler(config_path, dataset_name_ch, mode="snapshot"):
     load_config(config_path)
 
     base_url = config["base_url"]
@@ -112,9 +261,24 @@ def crawler(config_path, dataset_name_ch):
     url = f"{base_url}/{resource_id}?Authorization={authorization}"
     print("URL: ", url, "\n")
 
-    response = requests.get(url)
+    dir_path = config["base_dir"]
+    now = datetime.now(timezone(timedelta(hours=8)))
+    store_dir = os.path.join(dir_path, name, "store")
+
+    # 附加模式：抓資料的同時在背景合併過去日期的小檔
+    if mode == "append":
+        pool = ThreadPoolExecutor(1)
+        compaction = pool.submit(compact_store, store_dir, now.strftime("%Y-%m-%d"))
 
-    if response.status_code == 200:
+    # 和上次相同時回傳 None，不用解析
+    response = fetch.get_if_changed(
+        url, os.path.join(dir_path, name, "fetch_cache.json")
+    )
+
+    if response is None:
+        print("Not modified, skip.\n")
+
+    elif response.status_code == 200:
         if dataset_name_ch in [
             "自動氣象站-氣象觀測資料",
             "自動雨量站-雨量觀測資料",
@@ -126,16 +290,28 @@ def crawler(config_path, dataset_name_ch):
             df = json_to_df_uv(response.json()["records"])
 
         df = process_col_names(df)
-        df = process_99(df)
-        df = process_date(df)
+        df, rejected = clean_df(df)
+
+        for col, count in rejected.items():
+            print(f"Invalid: Column {col}: {count} value(s)")
+
+        now_str = now.strftime("%Y%m%d%H%M%S")
 
-        dir_path = config["base_dir"]
-        now = datetime.now(timezone(timedelta(hours=8))).strftime('%Y%m%d%H%M%S')
-        file_name = f"{name}_{now}.csv"
-        file_path = os.path.join(dir_path, name, file_name)
+        if mode == "append":
+            append_to_store(df, store_dir, now_str)
 
-        df.to_csv(file_path, index=False)
-        print(f"Data saved: {file_path}\n")
+        else:
+            file_name = f"{name}_{now_str}.csv"
+            file_path = os.path.join(dir_path, name, file_name)
+
+            file_path = sink.write(df, file_path)
+            print(f"Data saved: {file_path}\n")
+
+        fetch.commit(response)
 
     else:
         print(f"Failed to retrieve data: {response.status_code}")
+
+    if mode == "append":
+        compaction.result()
+        pool.shutdown()
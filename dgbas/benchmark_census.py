@@ -0,0 +1,67 @@
+import argparse
+import time
+import pandas as pd
+
+from population_and_housing_census import (
+    EXCEL_ENGINE,
+    PopulationAndHousingCensus,
+    Workbook,
+)
+
+
+# 舊版做法：每次讀sheet都用openpyxl重新開啟整個xlsx
+class ReopeningWorkbook:
+    def __init__(self, xlsx_path):
+        self.xlsx_path = xlsx_path
+
+    def read(self, sheet_name=0, skiprows=None):
+        return pd.read_excel(
+            self.xlsx_path, sheet_name=sheet_name, skiprows=skiprows, engine="openpyxl"
+        )
+
+
+def benchmark(data_dir, county_name, engine):
+    census = PopulationAndHousingCensus(data_dir)
+    total_old = total_new = 0
+
+    for table_name in census.table:
+        xlsx_path = census.get_xlsx_path(table_name, county_name)
+
+        if not census.is_valid_xlsx(xlsx_path):
+            xlsx_path = census.get_xlsx_path(table_name, county_name, converted=True)
+
+        if not census.is_valid_xlsx(xlsx_path):
+            print(f"Skip: {table_name} (no xlsx)")
+            continue
+
+        start = time.perf_counter()
+        df_old = census.workbook_to_df(
+            ReopeningWorkbook(xlsx_path), table_name, county_name
+        )
+        old = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with Workbook(xlsx_path, engine) as workbook:
+            df_new = census.workbook_to_df(workbook, table_name, county_name)
+        new = time.perf_counter() - start
+
+        # 不同engine可能只有數值型別不同
+        pd.testing.assert_frame_equal(df_old, df_new, check_dtype=False)
+
+        total_old += old
+        total_new += new
+        print(f"{table_name}: {old:.3f}s -> {new:.3f}s ({old / new:.1f}x)")
+
+    if total_new:
+        speedup = total_old / total_new
+        print(f"Total: {total_old:.2f}s -> {total_new:.2f}s ({speedup:.1f}x)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--data-dir", default="data")
+    parser.add_argument("--county", default="新北市")
+    parser.add_argument("--engine", default=EXCEL_ENGINE)
+    args = parser.parse_args()
+
+    benchmark(args.data_dir, args.county, args.engine)
@@ -0,0 +1,155 @@
+import argparse
+import glob
+import json
+import os
+import tempfile
+import timeit
+
+from dgbas import DGBAS
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+def record(request_dates, html_path):
+    # 錄製 ShowQuery 回應(原始 bytes)，之後可重複比對
+    html = DGBAS().get_html(request_dates)
+
+    with open(html_path, "wb") as f:
+        f.write(html)
+
+    print(f"Recorded: {html_path} ({len(html) / 1e6:.1f} MB)")
+
+
+def check(html_paths):
+    dgbas = DGBAS()
+
+    for html_path in html_paths:
+        # 預期結果：同檔名的 .json
+        json_path = os.path.splitext(html_path)[0] + ".json"
+
+        if not os.path.exists(json_path):
+            print(f"Skip check: {json_path}")
+            continue
+
+        with open(html_path, "rb") as f:
+            html = f.read()
+
+        with open(json_path, encoding="utf-8") as f:
+            expected = json.load(f)
+
+        # bytes 直接找
+        assert dgbas.html_to_json(html) == expected, html_path
+
+        # BeautifulSoup
+        assert dgbas.soup_to_json(html) == expected, html_path
+
+        # head 裡多一個 "Values": 時，bytes 解析失敗要退回 BeautifulSoup
+        html_fallback = html.replace(b"</head>", b'<!-- "Values": --></head>', 1)
+        assert dgbas.html_to_json(html_fallback) == expected, html_path
+
+        print(f"OK: {html_path} ({len(expected)} values)")
+
+
+def check_fallback(
+    html_path=os.path.join(fixture_dir, "showquery_202401.html"),
+    error_path=os.path.join(fixture_dir, "error_page.html"),
+):
+    with open(html_path, "rb") as f:
+        html = f.read()
+
+    with open(error_path, "rb") as f:
+        error_html = f.read()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        checkpoint_path = os.path.join(tmp_dir, "checkpoint.txt")
+
+        with open(checkpoint_path, "w") as f:
+            f.write("2023/09/01")
+
+        dgbas = DGBAS(
+            data_dir=tmp_dir, checkpoint_path=checkpoint_path, months_per_query=3
+        )
+
+        # 只留頁面裡有的欄位
+        dgbas.schema = {
+            "土地人口": ["年月", "縣市", "戶數", "人口數", "性比例"],
+            "交通安全": ["年月", "縣市", "道路交通事故-事故件數"],
+        }
+
+        # 多個月份的查詢回傳錯誤頁，單月回傳錄製的頁面
+        requests = []
+
+        def get_html(request_dates):
+            requests.append(request_dates)
+            return error_html if len(request_dates) > 1 else html
+
+        dgbas.get_html = get_html
+        dgbas.update_csv()
+
+        # 錯誤頁之後逐月補抓 2023/10~12，2024/01 有 "..." 停在這裡
+        assert requests == [
+            ["2023/10/01", "2023/11/01", "2023/12/01"],
+            ["2023/10/01"],
+            ["2023/11/01"],
+            ["2023/12/01"],
+            ["2024/01/01"],
+        ], requests
+        assert dgbas.months_per_query == 1
+
+        with open(checkpoint_path) as f:
+            assert f.read() == "2023/12/01"
+
+        for year_month in ["202310", "202311", "202312"]:
+            csv_path = os.path.join(
+                dgbas.dir_path["土地人口"], f"土地人口_{year_month}.csv"
+            )
+            assert os.path.exists(csv_path), csv_path
+
+    print(f"OK: batch query fallback ({html_path})")
+
+
+def benchmark(html_paths, repeat=5):
+    dgbas = DGBAS()
+
+    for html_path in html_paths:
+        with open(html_path, "rb") as f:
+            html = f.read()
+
+        # 確認兩者輸出相同
+        json_old = dgbas.soup_to_json(html)
+        json_new = dgbas.html_to_json(html)
+        assert json_old == json_new, html_path
+
+        old = min(
+            timeit.repeat(lambda: dgbas.soup_to_json(html), number=1, repeat=repeat)
+        )
+        new = min(
+            timeit.repeat(lambda: dgbas.html_to_json(html), number=1, repeat=repeat)
+        )
+
+        print(
+            f"{html_path}: {len(json_new)} values, "
+            f"{old:.3f}s -> {new:.3f}s ({old / new:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "html_paths",
+        nargs="*",
+        default=sorted(glob.glob(os.path.join(fixture_dir, "showquery_*.html"))),
+    )
+    parser.add_argument(
+        "--record",
+        help="先查詢這些月份(以 ; 分隔，例如 2024/01/01;2024/02/01)並存到 html_paths[0]",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.record:
+        record(args.record.split(";"), args.html_paths[0])
+
+    check(args.html_paths)
+    check_fallback()
+    benchmark(args.html_paths, args.repeat)
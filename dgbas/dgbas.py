@@ -1,18 +1,34 @@
-import requests
-from bs4 import BeautifulSoup
 import json
-import pandas as pd
 import os
-import time
+import re
+import sys
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
+
+# 有安裝 orjson 時用它解析 Values
+try:
+    from orjson import loads as json_loads
+
+except ImportError:
+    from json import loads as json_loads
 
 
 class DGBAS:
-    def __init__(self, data_dir="data", checkpoint_path="checkpoint.txt"):
+    def __init__(
+        self, data_dir="data", checkpoint_path="checkpoint.txt", months_per_query=12
+    ):
 
         self.base_url = "https://winsta.dgbas.gov.tw/網頁資料查詢/ShowQuery.aspx"
 
         self.checkpoint_path = checkpoint_path
 
+        # 補資料時一次查詢幾個月(axDate 以 ; 分隔)，1 為逐月查詢
+        self.months_per_query = months_per_query
+
         self.dir_path = {
             "土地人口": f"{data_dir}/1_population",
             "勞動就業": f"{data_dir}/2_labor",
@@ -305,7 +321,7 @@ class DGBAS:
             },
         }
 
-    def get_html(self, request_date):
+    def get_html(self, request_dates):
         county_code = ";".join(
             str(county_code) for county_code in self.map["county"].keys()
         )
@@ -318,7 +334,7 @@ class DGBAS:
             "period=M&"
             "axX=[Measures]&"
             "axY=[Date];[Place]&"
-            f"axDate={request_date}&"
+            f"axDate={';'.join(request_dates)}&"
             "axCycle=M月&"
             f"axCode={county_code}&"
             f"axEffect={column_code}&"
@@ -327,17 +343,31 @@ class DGBAS:
 
         print("\nURL:", url)
 
-        try:
-            response = requests.request("POST", url)
-
-        except Exception as e:
-            print(e)
-            time.sleep(10)
-            response = requests.request("POST", url)
+        # 連線錯誤與5xx由fetch的重試機制處理
+        response = fetch.request("POST", url)
 
-        return response.text
+        return response.content
 
     def html_to_json(self, html):
+        # 直接在 bytes 裡找 Values 陣列，不解析整個 HTML
+        marker = b'"Values":'
+        start = html.find(marker)
+        end = html.find(b"};//", start)
+
+        if start != -1 and end != -1:
+            try:
+                return json_loads(html[start + len(marker) : end])
+
+            except ValueError:
+                pass
+
+        # 找不到或解析失敗時，才用 BeautifulSoup 找 script
+        print("Values not extracted from bytes, parse HTML.")
+        return self.soup_to_json(html)
+
+    def soup_to_json(self, html):
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(html, "html.parser")
 
         # 取得資料字串
@@ -352,6 +382,8 @@ class DGBAS:
 
     def json_to_df(self, json_data):
 
+        import pandas as pd
+
         # 原：[Measures],[Date],[Place],Value
         df = pd.DataFrame(json_data)
 
@@ -374,24 +406,34 @@ class DGBAS:
 
         return df
 
-    def save_csv(self, request_date=None):
+    def get_df(self, request_dates):
+        html = self.get_html(request_dates)
+        json_data = self.html_to_json(html)
+        return self.json_to_df(json_data)
 
-        # default: 上個月
-        if not request_date:
-            request_date = (
-                (pd.Timestamp.now() - pd.DateOffset(months=1))
-                .replace(day=1)
-                .strftime("%Y/%m/01")
-            )
+    def to_request_date(self, date):
+        # [Date] 值轉成查詢用的日期：2024/01/01、113年1月 -> 2024/01/01
+        year, month = re.findall(r"\d+", str(date))[:2]
+        year = int(year) + 1911 if int(year) < 1911 else int(year)
+        return f"{year}/{int(month):02d}/01"
 
-        # 取得df
-        html = self.get_html(request_date)
-        json_data = self.html_to_json(html)
-        df = self.json_to_df(json_data)
+    def split_months(self, df, request_dates):
+        # 多個月份一起查詢、pivot 後，再依年月拆開
+        if len(request_dates) == 1:
+            return {request_dates[0]: df}
+
+        keys = df["年月"].map(self.to_request_date)
 
+        return {
+            request_date: df[keys == request_date].reset_index(drop=True)
+            for request_date in request_dates
+            if (keys == request_date).any()
+        }
+
+    def save_month(self, df, request_date):
         # 歷史資料可能會有整個column都是"..."的情況，將其取代為空字串
         if request_date < "2024/01/01":
-            df.replace({"...": ""}, inplace=True)
+            df = df.replace({"...": ""})
 
         # 確認資料是否完整（新資料）
         # if any((df[col] == "...").all() for col in df.columns):  # 某個column全是"..."
@@ -414,40 +456,82 @@ class DGBAS:
             columns = self.schema[dataset]
 
             # 存檔
-            df[columns].to_csv(csv_path, index=False)
+            csv_path = sink.write(df[columns], csv_path)
             print("Saved:", csv_path)
 
         return True
 
-    def update_csv(self):
+    def save_csv(self, request_date=None):
 
-        # 取得已儲存的最新資料日期
-        with open(self.checkpoint_path, "r") as f:
-            request_date = f.read()
+        import pandas as pd
+
+        # default: 上個月
+        if not request_date:
+            request_date = (
+                (pd.Timestamp.now() - pd.DateOffset(months=1))
+                .replace(day=1)
+                .strftime("%Y/%m/01")
+            )
 
-        # 轉成日期物件，計算下一個月
-        request_date_obj = pd.Timestamp(request_date) + pd.DateOffset(months=1)
+        # 取得df
+        df = self.get_df([request_date])
 
-        # 從下一個月到本月
-        while request_date_obj <= pd.Timestamp.now():
+        return self.save_month(df, request_date)
 
-            # 轉回日期字串
-            request_date = request_date_obj.strftime("%Y/%m/01")
+    def update_checkpoint(self, request_date):
+        with open(self.checkpoint_path, "w") as f:
+            f.write(request_date)
+            print("Updated checkpoint:", request_date)
 
-            # 若成功儲存csv（資料是完整的）
-            if self.save_csv(request_date):
+    def update_csv(self):
 
-                # 更新檢查點
-                with open(self.checkpoint_path, "w") as f:
-                    f.write(request_date)
-                    print("Updated checkpoint:", request_date)
+        import pandas as pd
 
-                # 下一個月
-                request_date_obj = request_date_obj + pd.DateOffset(months=1)
+        # 取得已儲存的最新資料日期
+        with open(self.checkpoint_path, "r") as f:
+            request_date = f.read()
 
-            # 若未儲存代表資料更新不完全
-            else:
-                break
+        # 從下一個月到本月
+        request_dates = pd.date_range(
+            pd.Timestamp(request_date) + pd.DateOffset(months=1),
+            pd.Timestamp.now(),
+            freq="MS",
+        ).strftime("%Y/%m/01")
+
+        # 每次查詢 months_per_query 個月
+        i = 0
+
+        while i < len(request_dates):
+            chunk = list(request_dates[i : i + self.months_per_query])
+            i += len(chunk)
+            df_months = {}
+
+            if len(chunk) > 1:
+                try:
+                    df_months = self.split_months(self.get_df(chunk), chunk)
+
+                except Exception as e:
+                    print(f"Batch query failed: {e!r}")
+
+                # 批次查詢失敗或沒有任何月份，之後都改回逐月查詢
+                if not df_months:
+                    print("Query month by month.")
+                    self.months_per_query = 1
+
+            for request_date in chunk:
+                if request_date in df_months:
+                    saved = self.save_month(df_months[request_date], request_date)
+
+                # 批次結果沒有這個月(尚未公布或不支援多個日期)，單獨再查一次
+                else:
+                    saved = self.save_csv(request_date)
+
+                # 若未儲存代表資料更新不完全
+                if not saved:
+                    return
+
+                # 更新檢查點，下一個月
+                self.update_checkpoint(request_date)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,53 @@
-import requests
+import hashlib
+import importlib.util
+import json
+import multiprocessing
 import os
-import pandas as pd
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from urllib.parse import urlparse
+
+# 只檢查有沒有安裝，用到時才 import
+if importlib.util.find_spec("python_calamine"):
+    EXCEL_ENGINE = "calamine"
+
+else:
+    EXCEL_ENGINE = "openpyxl"
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
+
+
+class Workbook:
+    # 同一個xlsx只解析一次，各sheet再依skiprows取出
+    def __init__(self, xlsx_path, engine=EXCEL_ENGINE):
+        import pandas as pd
+
+        self.excel_file = pd.ExcelFile(xlsx_path, engine=engine)
+
+    def read(self, sheet_name=0, skiprows=None):
+        return self.excel_file.parse(sheet_name=sheet_name, skiprows=skiprows)
+
+    def close(self):
+        self.excel_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
 
 
 class PopulationAndHousingCensus:
-    def __init__(self, data_dir):
+    def __init__(self, data_dir, excel_engine=EXCEL_ENGINE):
         self.data_dir = data_dir
+        self.excel_engine = excel_engine
         self.base_url = "https://ws.dgbas.gov.tw/001/Upload/463/relfile/11065"
 
         self.county = {
@@ -651,1453 +693,1446 @@ class PopulationAndHousingCensus:
             "連江縣": 4,
         }
 
-    def save_xlsx(self, table_name, county_name):
-        url = (
+        # 行政區較少，表格下方有其他資料需截掉的縣市
+        self.small_county = ["基隆市", "新竹市", "嘉義市", "澎湖縣", "金門縣", "連江縣"]
+
+        # 行政區較多，資料分散在多個sheet的縣市
+        self.big_county = ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]
+
+        # 各表格的讀取規則：
+        #   skiprows: 第一個sheet的表頭列數
+        #   small_county: small_county的表頭列數與需插入的欄位
+        #   columns: 欄位名稱
+        #   extra_sheets: 指定縣市需合併的其他sheet
+        #   dropna: 以此欄位為空判斷非資料列
+        #   merge_sheet: 欄位延續在另一個sheet，依鄉鎮市區合併
+        #   truncate: small_county只保留行政區數目的列數
+        self.spec = {
+            "1_常住人口數及人口密度": {
+                "skiprows": 18,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "常住人口數(人)",
+                    "常住人口數-男",
+                    "常住人口數-女",
+                    "土地面積（平方公里）",
+                    "人口密度（人 / 平方公里）",
+                    "年月",
+                    "縣市",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1],
+                    "skiprows": 14,
+                },
+                "dropna": "常住人口數(人)",
+            },
+            "2_常住人口之性比例（不含移工）": {
+                "skiprows": 18,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "常住人口數(人)",
+                    "常住人口數-男",
+                    "常住人口數-女",
+                    "性比例(女=100)",
+                    "年月",
+                    "縣市",
+                    "col8",
+                    "col9",
+                    "col10",
+                    "col11",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1],
+                    "skiprows": 14,
+                },
+                "dropna": "常住人口數(人)",
+            },
+            "3_常住人口之年齡結構": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "未滿１５歲",
+                    "１５－２４歲",
+                    "２５－３４歲",
+                    "３５－４４歲",
+                    "col7",
+                    "４５－５４歲",
+                    "５５－６４歲",
+                    "６５歲以上",
+                    "平均年齡（歲）",
+                    "col12",
+                    "年月",
+                    "縣市",
+                    "col15",
+                    "col16",
+                    "col17",
+                ],
+                "dropna": "總計",
+            },
+            "5_１５歲以上常住人口之婚姻狀況": {
+                "skiprows": 18,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "未婚",
+                    "有配偶或同居伴侶",
+                    "離婚或分居",
+                    "喪偶",
+                    "年月",
+                    "縣市",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1, 2],
+                    "skiprows": 14,
+                },
+                "dropna": "總計",
+            },
+            "6_６歲以上本國籍常住人口使用語言情形": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "６歲以上本國籍常住人口（人）",
+                    "每百位常住人口目前主要使用國語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前主要使用閩南語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前主要使用客語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前主要使用原住民族語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前主要使用其他語言之相對人數（人 / 百人） ",
+                    "col8",
+                    "每百位常住人口目前次要使用國語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前次要使用閩南語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前次要使用客語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前次要使用原住民族語之相對人數（人 / 百人） ",
+                    "每百位常住人口目前次要使用其他語言之相對人數（人 / 百人） ",
+                    "每百位常住人口目前不知或無次要使用語言之相對人數（人 / 百人） ",
+                    "col15",
+                    "年月",
+                    "縣市",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                ],
+                "dropna": "６歲以上本國籍常住人口（人）",
+                "truncate": True,
+            },
+            "7_６歲以上本國籍常住人口兒時最早學會語言情形": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "６歲以上本國籍常住人口（人）",
+                    "每百位常住人口兒時最早學會國語之相對人數（人 / 百人） ",
+                    "每百位常住人口兒時最早學會閩南語之相對人數（人 / 百人） ",
+                    "每百位常住人口兒時最早學會客語之相對人數（人 / 百人） ",
+                    "col6",
+                    "每百位常住人口兒時最早學會原住民族語之相對人數（人 / 百人） ",
+                    "每百位常住人口兒時最早學會其他語言之相對人數（人 / 百人） ",
+                    "每百位常住人口兒時不知或無最早學會語言之相對人數（人 / 百人） ",
+                    "col10",
+                    "年月",
+                    "縣市",
+                    "col13",
+                    "col14",
+                    "col15",
+                    "col16",
+                ],
+                "dropna": "６歲以上本國籍常住人口（人）",
+                "truncate": True,
+            },
+            "8_６歲以上本國籍常住人口之父、母最常使用語言情形": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "６歲以上本國籍常住人口（人）",
+                    "每百位父親最常使用國語之相對人數（人 / 百人） ",
+                    "每百位父親最常使用閩南語之相對人數（人 / 百人） ",
+                    "每百位父親最常使用客語之相對人數（人 / 百人） ",
+                    "每百位父親最常使用原住民族語之相對人數（人 / 百人） ",
+                    "每百位父親最常使用其他語言之相對人數（人 / 百人） ",
+                    "col8",
+                    "每百位母親最常使用國語之相對人數（人 / 百人） ",
+                    "每百位母親最常使用閩南語之相對人數（人 / 百人） ",
+                    "每百位母親最常使用客語之相對人數（人 / 百人） ",
+                    "每百位母親最常使用原住民族語之相對人數（人 / 百人） ",
+                    "每百位母親最常使用其他語言之相對人數（人 / 百人） ",
+                    "col14",
+                    "年月",
+                    "縣市",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                    "col22",
+                ],
+                "dropna": "６歲以上本國籍常住人口（人）",
+                "truncate": True,
+            },
+            "9_６至３４歲常住人口之在學情形": {
+                "skiprows": 18,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "在學",
+                    "不在學",
+                    "在學率（％）",
+                    "年月",
+                    "縣市",
+                    "col8",
+                    "col9",
+                    "col10",
+                    "col11",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1, 2],
+                    "skiprows": 14,
+                },
+                "dropna": "總計",
+            },
+            "10_１５歲以上常住人口之教育程度": {
+                "skiprows": 20,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "國小及以下",
+                    "國（初）中",
+                    "高級中等",
+                    "大專及以上",
+                    "年月",
+                    "縣市",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1],
+                    "skiprows": 16,
+                },
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "12_１５歲以上民間常住人口之工作狀況": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "有工作合計",
+                    "農、林、漁、牧業",
+                    "工業小計",
+                    "col6",
+                    "製造業",
+                    "營建工程業",
+                    "服務業小計",
+                    "批發及零售業",
+                    "col11",
+                    "年月",
+                    "縣市",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                ],
+                "dropna": "總計",
+                "merge_sheet": {
+                    "sheet_name": 1,
+                    "skiprows": 16,
+                    "columns": [
+                        "col0",
+                        "鄉鎮市區",
+                        "運輸及倉儲業",
+                        "住宿及餐飲業",
+                        "金融及保險業",
+                        "公共行政及國防；強制性社會安全",
+                        "col6",
+                        "教育業",
+                        "醫療保健及社會工作服務業",
+                        "其他服務業",
+                        "無工作",
+                        "col11",
+                        "年月",
+                        "縣市",
+                        "col14",
+                        "col15",
+                        "col16",
+                        "col17",
+                    ],
+                    "dropna": "運輸及倉儲業",
+                },
+                "truncate": True,
+            },
+            "13_１５歲以上民間常住人口有工作者之職業": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "民意代表、主管及經理人員",
+                    "專業人員",
+                    "技術員及助理專業人員",
+                    "事務支援人員",
+                    "col7",
+                    "服務及銷售工作人員",
+                    "農、林、漁、牧業生產人員",
+                    "技藝有關工作人員",
+                    "機械設備操作及組裝人員",
+                    "基層技術工及勞力工",
+                    "col13",
+                    "年月",
+                    "縣市",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "14_１５歲以上民間常住人口有工作者之工作地與經常居住地概況": {
+                "skiprows": 19,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "同現住鄉鎮市區",
+                    "同現住縣市不同鄉鎮市區",
+                    "不同縣市或國外地區",
+                    "年月",
+                    "縣市",
+                    "col8",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1],
+                    "skiprows": 15,
+                },
+                "dropna": "總計",
+            },
+            "15_１５歲以上跨鄉鎮市區通勤工作人口之年齡結構": {
+                "skiprows": 19,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "１５－２４歲",
+                    "２５－３４歲",
+                    "３５－４４歲",
+                    "４５歲以上",
+                    "年月",
+                    "縣市",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                    "col13",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1],
+                    "skiprows": 15,
+                },
+                "dropna": "總計",
+            },
+            "16_１５歲以上跨鄉鎮市區通勤工作人口之教育程度": {
+                "skiprows": 20,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "國小及以下",
+                    "國（初）中",
+                    "高級中等",
+                    "大專及以上",
+                    "年月",
+                    "縣市",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1],
+                    "skiprows": 16,
+                },
+                "dropna": "總計",
+            },
+            "17_６歲以上在學人口之在學地與經常居住地概況": {
+                "skiprows": 19,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "同現住鄉鎮市區",
+                    "同現住縣市不同鄉鎮市區",
+                    "不同縣市或國外地區",
+                    "年月",
+                    "縣市",
+                    "col8",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1],
+                    "skiprows": 15,
+                },
+                "dropna": "總計",
+            },
+            "18_６歲以上跨鄉鎮市區通學人口之年齡結構": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "６－１１歲",
+                    "１２－１４歲",
+                    "col5",
+                    "１５－１７歲",
+                    "１８－２４歲",
+                    "２５歲以上",
+                    "col9",
+                    "年月",
+                    "縣市",
+                    "col12",
+                    "col13",
+                    "col14",
+                    "col15",
+                ],
+                "dropna": "總計",
+            },
+            "19_６歲以上跨鄉鎮市區通學人口之教育程度": {
+                "skiprows": 20,
+                "small_county": {
+                    "skiprows": 17,
+                    "insert_column": [5, "col13"],
+                },
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "國小及以下",
+                    "國（初）中",
+                    "高級中等",
+                    "大專及以上",
+                    "col7",
+                    "年月",
+                    "縣市",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": [
+                        county
+                        for county in self.county
+                        if county not in self.small_county
+                    ],
+                    "sheet_names": [1],
+                    "skiprows": 16,
+                },
+                "dropna": "總計",
+            },
+            "20_５歲以上常住人口遷徙情形": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "同現住處所",
+                    "同現住鄉鎮市區不同處所",
+                    "col5",
+                    "同現住縣市不同鄉鎮市區",
+                    "不同縣市",
+                    "大陸地區（含港澳）及國外地區",
+                    "col9",
+                    "年月",
+                    "縣市",
+                    "col12",
+                    "col13",
+                    "col14",
+                    "col15",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "21_學齡前兒童幼托及照顧概況": {
+                "skiprows": 18,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "已上幼兒園",
+                    "未上幼兒園合計",
+                    "未上幼兒園（托育）",
+                    "未上幼兒園（由家人照顧）",
+                    "年月",
+                    "縣市",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1, 2],
+                    "skiprows": 14,
+                },
+                "dropna": "總計",
+            },
+            "22_常住人口長期照顧需求者概況": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "需長期照顧人數（人）",
+                    "每百位需長期照顧人口有吃飯障礙之相對人次（人 / 百人） ",
+                    "每百位需長期照顧人口有上下床障礙之相對人次（人 / 百人） ",
+                    "每百位需長期照顧人口有穿脫衣服障礙之相對人次（人 / 百人） ",
+                    "每百位需長期照顧人口有上廁所障礙之相對人次（人 / 百人） ",
+                    "col7",
+                    "每百位需長期照顧人口有洗澡障礙之相對人次（人 / 百人） ",
+                    "每百位需長期照顧人口有在室內外走動障礙之相對人次（人 / 百人） ",
+                    "每百位需長期照顧人口有備餐（煮飯）障礙之相對人次（人 / 百人） ",
+                    "每百位需長期照顧人口有洗（含晾曬）衣服障礙之相對人次（人 / 百人） ",
+                    "每百位需長期照顧人口有處理家務（打掃、擦桌等清潔工作）障礙之相對人次（人 / 百人） ",
+                    "col13",
+                    "年月",
+                    "縣市",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                ],
+                "dropna": "需長期照顧人數（人）",
+                "truncate": True,
+            },
+            "24_１５歲以上常住人口與現有子女之居住概況": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "有子女者，與其居住距離最近的子女之居住地點（合計）",
+                    "有子女者，與其居住距離最近的子女之居住地點（同居住處所）",
+                    "有子女者，與其居住距離最近的子女之居住地點（同鄉鎮市區不同處所）",
+                    "col6",
+                    "有子女者，與其居住距離最近的子女之居住地點（同縣市不同鄉鎮市區）",
+                    "有子女者，與其居住距離最近的子女之居住地點（其他縣市）",
+                    "有子女者，與其居住距離最近的子女之居住地點（大陸地區（含港澳）及其他）",
+                    "無子女者",
+                    "col11",
+                    "年月",
+                    "縣市",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "26_６５歲以上常住人口之居住概況": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "僅與配偶或同居伴侶同住",
+                    "與子女同住",
+                    "col5",
+                    "與親友同住",
+                    "獨居",
+                    "其他",
+                    "col9",
+                    "年月",
+                    "縣市",
+                    "col12",
+                    "col13",
+                    "col14",
+                    "col15",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "27_身心障礙常住人口之性別及年齡結構": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "男",
+                    "女",
+                    "col5",
+                    "未滿２５歲",
+                    "２５－４４歲",
+                    "４５－６４歲",
+                    "６５歲以上",
+                    "col10",
+                    "年月",
+                    "縣市",
+                    "col13",
+                    "col14",
+                    "col15",
+                    "col16",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "29_常住人口之國籍分布": None,
+            "30_外國籍與大陸港澳配偶常住人口數": None,
+            "31_住戶數、常住人口數及平均每戶人口數": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計-戶數（戶）",
+                    "總計-常住人口數（人）",
+                    "總計-平均每戶人口數（人 / 戶）",
+                    "普通住戶-戶數（戶）",
+                    "col6",
+                    "普通住戶-常住人口數（人）",
+                    "普通住戶-平均每戶人口數（人 / 戶）",
+                    "非普通住戶-戶數（戶）",
+                    "非普通住戶-常住人口數（人）",
+                    "非普通住戶-平均每戶人口數（人 / 戶）",
+                    "col12",
+                    "年月",
+                    "縣市",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                    "col22",
+                ],
+                "dropna": "總計-戶數（戶）",
+            },
+            "32_普通住戶之戶內人口數": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "１人",
+                    "２人",
+                    "３人",
+                    "col6",
+                    "４人",
+                    "５人",
+                    "６人以上",
+                    "平均每戶人口數（人 / 戶）",
+                    "col11",
+                    "年月",
+                    "縣市",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                ],
+                "dropna": "總計",
+            },
+            "33_普通住戶之家戶型態": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "核心家戶-合計",
+                    "核心家戶-夫婦、配偶或同居伴侶",
+                    "核心家戶-父母與未婚子女",
+                    "核心家戶-父（或母）與未婚子女（單親家庭）",
+                    "主幹家戶-合計",
+                    "col8",
+                    "主幹家戶-袓父母、父母及未婚子女",
+                    "主幹家戶-父母與已婚子女",
+                    "主幹家戶-袓父母與未婚孫子女（隔代家庭）",
+                    "單人家戶",
+                    "其他家戶-合計",
+                    "其他家戶-有親屬關係",
+                    "其他家戶-無親屬關係",
+                    "col16",
+                    "年月",
+                    "縣市",
+                    "col19",
+                    "col20",
+                    "col21",
+                    "col22",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "34_普通住戶之住宅所有權屬": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "自有",
+                    "不住在一起的配偶、父母或子女所擁有",
+                    "col5",
+                    "租用",
+                    "配住或其他（含借住）",
+                    "col8",
+                    "年月",
+                    "縣市",
+                    "col11",
+                    "col12",
+                    "col13",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                ],
+                "dropna": "總計",
+            },
+            "35_普通住戶住進現宅時間": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "７９年以前",
+                    "８０－８９年",
+                    "９０－９９年",
+                    "col6",
+                    "１００－１０４年",
+                    "１０５－１０８年",
+                    "１０９年",
+                    "col10",
+                    "年月",
+                    "縣市",
+                    "col13",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                ],
+                "dropna": "總計",
+            },
+            "36_普通住戶在家上網情形": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "家裡可以上網（戶）",
+                    "每百戶普通住戶有桌上型電腦之相對戶數（戶 / 百戶）",
+                    "每百戶普通住戶有筆記型電腦之相對戶數（戶 / 百戶）",
+                    "每百戶普通住戶有平板電腦之相對戶數（戶 / 百戶）",
+                    "col7",
+                    "每百戶普通住戶有手機之相對戶數（戶 / 百戶）",
+                    "每百戶普通住戶有智慧型家電之相對戶數（戶 / 百戶）",
+                    "每百戶普通住戶有其他上網設備之相對戶數（戶 / 百戶）",
+                    "家裡無法上網（戶）",
+                    "col12",
+                    "年月",
+                    "縣市",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                ],
+                "dropna": "總計",
+            },
+            "37_住宅使用情形": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "有人經常居住住宅",
+                    "無人經常居住住宅-合計",
+                    "col5",
+                    "無人經常居住住宅-偶爾自住",
+                    "無人經常居住住宅-自住以外用途（如辦公室、倉庫等）",
+                    "無人經常居住住宅-目前沒有使用",
+                    "col9",
+                    "年月",
+                    "縣市",
+                    "col12",
+                    "col13",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                ],
+                "dropna": "總計",
+            },
+            "38_住宅之竣工年份": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "６９年以前",
+                    "７０－７９年",
+                    "８０－８９年",
+                    "col6",
+                    "９０－９９年",
+                    "１００－１０９年合計",
+                    "１００－１０４年",
+                    "１０５－１０９年",
+                    "col11",
+                    "年月",
+                    "縣市",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                ],
+                "dropna": "總計",
+            },
+            "39_住宅之樓地板面積": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "未滿６０平方公尺",
+                    "６０－未滿１２０平方公尺",
+                    "col5",
+                    "１２０－未滿１８０平方公尺",
+                    "１８０－未滿３００平方公尺",
+                    "３００平方公尺以上",
+                    "平均每宅面積（平方公尺 / 宅）",
+                    "col10",
+                    "年月",
+                    "縣市",
+                    "col13",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                ],
+                "dropna": "總計",
+            },
+            "40_住宅之建築類型": {
+                "skiprows": 18,
+                "small_county": {
+                    "skiprows": 16,
+                    "insert_column": [5, "col16"],
+                },
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "平房",
+                    "２－５樓",
+                    "６－１２樓",
+                    "１３樓以上",
+                    "年月",
+                    "縣市",
+                    "col9",
+                    "col10",
+                    "col11",
+                    "col12",
+                    "col13",
+                    "col14",
+                    "col15",
+                ],
+                "extra_sheets": {
+                    "counties": self.big_county,
+                    "sheet_names": [1, 2],
+                    "skiprows": 14,
+                },
+                "dropna": "總計",
+            },
+            "43_有人經常居住住宅之使用情形": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "住宅專用",
+                    "住宅兼其他用途-合計",
+                    "col5",
+                    "住宅兼其他用途-兼工業用",
+                    "住宅兼其他用途-兼商業或服務業用",
+                    "住宅兼其他用途-兼農業用",
+                    "col9",
+                    "年月",
+                    "縣市",
+                    "col12",
+                    "col13",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                    "col22",
+                ],
+                "dropna": "總計",
+            },
+            "44_有人經常居住住宅之居住人數": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "１人",
+                    "２人",
+                    "３人",
+                    "col6",
+                    "４人",
+                    "５人",
+                    "６人以上",
+                    "平均每宅居住人口數（人 / 宅）",
+                    "col11",
+                    "年月",
+                    "縣市",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                    "col22",
+                ],
+                "dropna": "總計",
+            },
+            "45_有人經常居住住宅之房廳數": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "１間",
+                    "２間",
+                    "３間",
+                    "col6",
+                    "４間",
+                    "５間",
+                    "６間以上",
+                    "平均每宅房廳數（間 / 宅）",
+                    "col11",
+                    "年月",
+                    "縣市",
+                    "col14",
+                    "col15",
+                    "col16",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                    "col22",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+            "46_有人經常居住住宅之平均每人使用房廳數及衛浴套數": {
+                "skiprows": 16,
+                "columns": [
+                    "col0",
+                    "鄉鎮市區",
+                    "總計",
+                    "每人使用房廳數-未滿１間",
+                    "每人使用房廳數-１－未滿２間",
+                    "每人使用房廳數-２－未滿３間",
+                    "每人使用房廳數-３間以上",
+                    "每人使用房廳數-平均每人使用房廳數（間 / 人）",
+                    "col8",
+                    "每人使用衛浴套數-未滿０. ５套",
+                    "每人使用衛浴套數-０. ５－未滿１套",
+                    "每人使用衛浴套數-１－未滿２套",
+                    "每人使用衛浴套數-２套以上",
+                    "每人使用衛浴套數-平均每人使用衛浴套數（套 / 人）",
+                    "col14",
+                    "年月",
+                    "縣市",
+                    "col17",
+                    "col18",
+                    "col19",
+                    "col20",
+                    "col21",
+                    "col22",
+                    "col23",
+                    "col24",
+                    "col25",
+                ],
+                "dropna": "總計",
+                "truncate": True,
+            },
+        }
+
+        # 格式相同的表格共用同一個spec
+        for table_name, same_as in [
+            ("4_常住人口之年齡結構（不含移工）", "3_常住人口之年齡結構"),
+            ("11_１５歲以上常住人口之最高學歷", "10_１５歲以上常住人口之教育程度"),
+            (
+                "23_６５歲以上常住人口長期照顧需求者概況",
+                "22_常住人口長期照顧需求者概況",
+            ),
+            (
+                "25_６５歲以上常住人口與現有子女之居住概況",
+                "24_１５歲以上常住人口與現有子女之居住概況",
+            ),
+            (
+                "28_原住民族常住人口之性別及年齡結構",
+                "27_身心障礙常住人口之性別及年齡結構",
+            ),
+            ("41_空閒住宅之竣工年份", "38_住宅之竣工年份"),
+            ("42_空閒住宅之樓地板面積", "39_住宅之樓地板面積"),
+        ]:
+            self.spec[table_name] = self.spec[same_as]
+
+    def get_xlsx_url(self, table_name, county_name):
+        return (
             f"{self.base_url}/{self.county[county_name]}/{self.table[table_name]}.xlsx"
         )
-        print("URL:", url)
 
-        response = requests.get(url)
+    def get_xlsx_path(self, table_name, county_name, converted=False):
+        dir_path = os.path.join(self.data_dir, table_name, "xlsx")
 
-        if response.status_code == 200:
-            dir_path = os.path.join(self.data_dir, table_name, "xlsx")
-            os.makedirs(dir_path, exist_ok=True)
-            xlsx_path = os.path.join(dir_path, f"{table_name}_{county_name}.xlsx")
-
-            with open(xlsx_path, "wb") as f:
-                f.write(response.content)
-                print(f"Saved {xlsx_path}.")
+        if converted:
+            dir_path = os.path.join(dir_path, "converted")
 
-        else:
-            raise Exception(
-                f"Failed to download file. Status code: {response.status_code}"
-            )
+        return os.path.join(dir_path, f"{table_name}_{county_name}.xlsx")
 
-    def xlsx_to_df(self, table_name, county_name):
-        xlsx_name = f"{table_name}_{county_name}.xlsx"
-        xlsx_path = os.path.join(self.data_dir, table_name, "xlsx", xlsx_name)
+    def get_csv_path(self, table_name, county_name):
+        # 副檔名依 sink 的輸出格式
+        return sink.get_path(
+            os.path.join(self.data_dir, table_name, f"{table_name}_{county_name}.csv")
+        )
 
-        if table_name == "1_常住人口數及人口密度":
-            df = pd.read_excel(xlsx_path, skiprows=18)
+    def is_valid_xlsx(self, xlsx_path):
+        # xlsx是zip檔，下載中斷的檔案無法通過檢查
+        if not os.path.exists(xlsx_path) or not zipfile.is_zipfile(xlsx_path):
+            return False
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "常住人口數(人)",
-                "常住人口數-男",
-                "常住人口數-女",
-                "土地面積（平方公里）",
-                "人口密度（人 / 平方公里）",
-                "年月",
-                "縣市",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-            ]
+        with zipfile.ZipFile(xlsx_path) as zf:
+            return "[Content_Types].xml" in zf.namelist()
 
-            df.columns = columns
+    def is_converted(self, table_name, county_name):
+        return os.path.exists(self.get_csv_path(table_name, county_name)) and (
+            self.is_valid_xlsx(self.get_xlsx_path(table_name, county_name, True))
+        )
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=14)
-                df2.columns = columns
-                df = pd.concat([df, df2])
+    def write_xlsx(self, table_name, county_name, content):
+        xlsx_path = self.get_xlsx_path(table_name, county_name)
+        os.makedirs(os.path.dirname(xlsx_path), exist_ok=True)
 
-            df = df.dropna(subset=["常住人口數(人)"])
-            df = df.replace("　", "", regex=True)
+        # 先寫入暫存檔再改名，避免留下不完整的xlsx
+        tmp_path = f"{xlsx_path}.part"
 
-        elif table_name == "2_常住人口之性比例（不含移工）":
-            df = pd.read_excel(xlsx_path, skiprows=18)
+        with open(tmp_path, "wb") as f:
+            f.write(content)
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "常住人口數(人)",
-                "常住人口數-男",
-                "常住人口數-女",
-                "性比例(女=100)",
-                "年月",
-                "縣市",
-                "col8",
-                "col9",
-                "col10",
-                "col11",
-            ]
+        os.replace(tmp_path, xlsx_path)
+        print(f"Saved {xlsx_path}.")
 
-            df.columns = columns
+    def save_xlsx(self, table_name, county_name):
+        url = self.get_xlsx_url(table_name, county_name)
+        print("URL:", url)
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=14)
-                df2.columns = columns
-                df = pd.concat([df, df2])
+        response = fetch.get(url)
 
-            df = df.dropna(subset=["常住人口數(人)"])
-            df = df.replace("　", "", regex=True)
+        if response.status_code == 200:
+            self.write_xlsx(table_name, county_name, response.content)
 
-        elif table_name in ["3_常住人口之年齡結構", "4_常住人口之年齡結構（不含移工）"]:
-            df = pd.read_excel(xlsx_path, skiprows=16)
+        else:
+            raise Exception(
+                f"Failed to download file. Status code: {response.status_code}"
+            )
 
-            df.columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "未滿１５歲",
-                "１５－２４歲",
-                "２５－３４歲",
-                "３５－４４歲",
-                "col7",
-                "４５－５４歲",
-                "５５－６４歲",
-                "６５歲以上",
-                "平均年齡（歲）",
-                "col12",
-                "年月",
-                "縣市",
-                "col15",
-                "col16",
-                "col17",
-            ]
+    def xlsx_to_df(self, table_name, county_name):
+        xlsx_path = self.get_xlsx_path(table_name, county_name)
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+        # 已轉檔過的xlsx在converted資料夾
+        if not os.path.exists(xlsx_path):
+            xlsx_path = self.get_xlsx_path(table_name, county_name, converted=True)
 
-        elif table_name == "5_１５歲以上常住人口之婚姻狀況":
-            df = pd.read_excel(xlsx_path, skiprows=18)
+        with Workbook(xlsx_path, self.excel_engine) as workbook:
+            return self.workbook_to_df(workbook, table_name, county_name)
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "未婚",
-                "有配偶或同居伴侶",
-                "離婚或分居",
-                "喪偶",
-                "年月",
-                "縣市",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-            ]
+    def workbook_to_df(self, workbook, table_name, county_name):
+        import pandas as pd
 
-            df.columns = columns
+        spec = self.spec[table_name]
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                for sheet_name in [1, 2]:
-                    df2 = pd.read_excel(xlsx_path, sheet_name=sheet_name, skiprows=14)
-                    df2.columns = columns
-                    df = pd.concat([df, df2])
+        if spec is None:
+            return None
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+        skiprows = spec["skiprows"]
+        columns = list(spec["columns"])
 
-        elif table_name == "6_６歲以上本國籍常住人口使用語言情形":
-            df = pd.read_excel(xlsx_path, skiprows=16)
+        if "small_county" in spec and county_name in self.small_county:
+            skiprows = spec["small_county"]["skiprows"]
+            columns.insert(*spec["small_county"]["insert_column"])
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "６歲以上本國籍常住人口（人）",
-                "每百位常住人口目前主要使用國語之相對人數（人 / 百人） ",
-                "每百位常住人口目前主要使用閩南語之相對人數（人 / 百人） ",
-                "每百位常住人口目前主要使用客語之相對人數（人 / 百人） ",
-                "每百位常住人口目前主要使用原住民族語之相對人數（人 / 百人） ",
-                "每百位常住人口目前主要使用其他語言之相對人數（人 / 百人） ",
-                "col8",
-                "每百位常住人口目前次要使用國語之相對人數（人 / 百人） ",
-                "每百位常住人口目前次要使用閩南語之相對人數（人 / 百人） ",
-                "每百位常住人口目前次要使用客語之相對人數（人 / 百人） ",
-                "每百位常住人口目前次要使用原住民族語之相對人數（人 / 百人） ",
-                "每百位常住人口目前次要使用其他語言之相對人數（人 / 百人） ",
-                "每百位常住人口目前不知或無次要使用語言之相對人數（人 / 百人） ",
-                "col15",
-                "年月",
-                "縣市",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-            ]
-
-            df.columns = columns
-            df = df.dropna(subset=["６歲以上本國籍常住人口（人）"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "7_６歲以上本國籍常住人口兒時最早學會語言情形":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "６歲以上本國籍常住人口（人）",
-                "每百位常住人口兒時最早學會國語之相對人數（人 / 百人） ",
-                "每百位常住人口兒時最早學會閩南語之相對人數（人 / 百人） ",
-                "每百位常住人口兒時最早學會客語之相對人數（人 / 百人） ",
-                "col6",
-                "每百位常住人口兒時最早學會原住民族語之相對人數（人 / 百人） ",
-                "每百位常住人口兒時最早學會其他語言之相對人數（人 / 百人） ",
-                "每百位常住人口兒時不知或無最早學會語言之相對人數（人 / 百人） ",
-                "col10",
-                "年月",
-                "縣市",
-                "col13",
-                "col14",
-                "col15",
-                "col16",
-            ]
-
-            df.columns = columns
-            df = df.dropna(subset=["６歲以上本國籍常住人口（人）"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "8_６歲以上本國籍常住人口之父、母最常使用語言情形":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "６歲以上本國籍常住人口（人）",
-                "每百位父親最常使用國語之相對人數（人 / 百人） ",
-                "每百位父親最常使用閩南語之相對人數（人 / 百人） ",
-                "每百位父親最常使用客語之相對人數（人 / 百人） ",
-                "每百位父親最常使用原住民族語之相對人數（人 / 百人） ",
-                "每百位父親最常使用其他語言之相對人數（人 / 百人） ",
-                "col8",
-                "每百位母親最常使用國語之相對人數（人 / 百人） ",
-                "每百位母親最常使用閩南語之相對人數（人 / 百人） ",
-                "每百位母親最常使用客語之相對人數（人 / 百人） ",
-                "每百位母親最常使用原住民族語之相對人數（人 / 百人） ",
-                "每百位母親最常使用其他語言之相對人數（人 / 百人） ",
-                "col14",
-                "年月",
-                "縣市",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-                "col22",
-            ]
-
-            df.columns = columns
-            df = df.dropna(subset=["６歲以上本國籍常住人口（人）"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "9_６至３４歲常住人口之在學情形":
-            df = pd.read_excel(xlsx_path, skiprows=18)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "在學",
-                "不在學",
-                "在學率（％）",
-                "年月",
-                "縣市",
-                "col8",
-                "col9",
-                "col10",
-                "col11",
-            ]
-
-            df.columns = columns
-
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                for sheet_name in [1, 2]:
-                    df2 = pd.read_excel(xlsx_path, sheet_name=sheet_name, skiprows=14)
-                    df2.columns = columns
-                    df = pd.concat([df, df2])
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name in [
-            "10_１５歲以上常住人口之教育程度",
-            "11_１５歲以上常住人口之最高學歷",
-        ]:
-            df = pd.read_excel(xlsx_path, skiprows=20)
+        df = workbook.read(skiprows=skiprows)
+        df.columns = columns
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "國小及以下",
-                "國（初）中",
-                "高級中等",
-                "大專及以上",
-                "年月",
-                "縣市",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-            ]
+        extra_sheets = spec.get("extra_sheets")
 
-            df.columns = columns
+        if extra_sheets and county_name in extra_sheets["counties"]:
+            dfs = [df]
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=16)
+            for sheet_name in extra_sheets["sheet_names"]:
+                df2 = workbook.read(
+                    sheet_name=sheet_name, skiprows=extra_sheets["skiprows"]
+                )
                 df2.columns = columns
-                df = pd.concat([df, df2])
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "12_１５歲以上民間常住人口之工作狀況":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns_1 = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "有工作合計",
-                "農、林、漁、牧業",
-                "工業小計",
-                "col6",
-                "製造業",
-                "營建工程業",
-                "服務業小計",
-                "批發及零售業",
-                "col11",
-                "年月",
-                "縣市",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-            ]
-
-            df.columns = columns_1
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+                dfs.append(df2)
 
-            df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=16)
+            df = pd.concat(dfs)
 
-            columns_2 = [
-                "col0",
-                "鄉鎮市區",
-                "運輸及倉儲業",
-                "住宿及餐飲業",
-                "金融及保險業",
-                "公共行政及國防；強制性社會安全",
-                "col6",
-                "教育業",
-                "醫療保健及社會工作服務業",
-                "其他服務業",
-                "無工作",
-                "col11",
-                "年月",
-                "縣市",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-            ]
+        df = df.dropna(subset=[spec["dropna"]])
+        df = df.replace("　", "", regex=True)
 
-            df2.columns = columns_2
+        merge_sheet = spec.get("merge_sheet")
 
-            df2 = df2.dropna(subset=["運輸及倉儲業"])
+        if merge_sheet:
+            df2 = workbook.read(
+                sheet_name=merge_sheet["sheet_name"], skiprows=merge_sheet["skiprows"]
+            )
+            df2.columns = merge_sheet["columns"]
+            df2 = df2.dropna(subset=[merge_sheet["dropna"]])
             df2 = df2.replace("　", "", regex=True)
 
             df = pd.merge(df, df2, on="鄉鎮市區", how="inner")
 
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "13_１５歲以上民間常住人口有工作者之職業":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "民意代表、主管及經理人員",
-                "專業人員",
-                "技術員及助理專業人員",
-                "事務支援人員",
-                "col7",
-                "服務及銷售工作人員",
-                "農、林、漁、牧業生產人員",
-                "技藝有關工作人員",
-                "機械設備操作及組裝人員",
-                "基層技術工及勞力工",
-                "col13",
-                "年月",
-                "縣市",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "14_１５歲以上民間常住人口有工作者之工作地與經常居住地概況":
-            df = pd.read_excel(xlsx_path, skiprows=19)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "同現住鄉鎮市區",
-                "同現住縣市不同鄉鎮市區",
-                "不同縣市或國外地區",
-                "年月",
-                "縣市",
-                "col8",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-            ]
-
-            df.columns = columns
+        if spec.get("truncate") and county_name in self.small_county:
+            num = self.number_of_district[county_name]
+            df = df[:num]
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=15)
-                df2.columns = columns
-                df = pd.concat([df, df2])
+        # 填入年月與縣市
+        df["年月"] = "109-11"
+        df["縣市"] = county_name
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+        # 選擇需要的欄位
+        df = df[self.column[table_name]]
 
-        elif table_name == "15_１５歲以上跨鄉鎮市區通勤工作人口之年齡結構":
-            df = pd.read_excel(xlsx_path, skiprows=19)
+        # 檢查行政區數目
+        if len(df) != self.number_of_district[county_name]:
+            raise ValueError(
+                f"行政區數目錯誤：{county_name}({len(df)}/{self.number_of_district[county_name]})"
+            )
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "１５－２４歲",
-                "２５－３４歲",
-                "３５－４４歲",
-                "４５歲以上",
-                "年月",
-                "縣市",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-                "col13",
-            ]
+        # 檢查空值
+        if df.isnull().any().any():
+            raise ValueError("DataFrame contains empty (NaN) values.")
 
-            df.columns = columns
+        return df
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=15)
-                df2.columns = columns
-                df = pd.concat([df, df2])
+    def df_to_csv(self, df, table_name, county_name):
+        xlsx_dir = os.path.join(self.data_dir, table_name, "xlsx")
+        xlsx_name = f"{table_name}_{county_name}.xlsx"
+        xlsx_path = os.path.join(xlsx_dir, xlsx_name)
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+        # 儲存csv
+        csv_path = sink.write(df, self.get_csv_path(table_name, county_name))
+        print(f"Saved {csv_path}.")
 
-        elif table_name == "16_１５歲以上跨鄉鎮市區通勤工作人口之教育程度":
-            df = pd.read_excel(xlsx_path, skiprows=20)
+        # # 壓縮xlsx
+        # zip_path = xlsx_path.replace(".xlsx", ".zip")
+        # os.system(f"zip {zip_path} {xlsx_path}")
+        # print(f"Saved {zip_path}.")
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "國小及以下",
-                "國（初）中",
-                "高級中等",
-                "大專及以上",
-                "年月",
-                "縣市",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-            ]
+        # 將xlsx移到converted資料夾
+        converted_dir = os.path.join(self.data_dir, table_name, "xlsx", "converted")
+        os.makedirs(converted_dir, exist_ok=True)
 
-            df.columns = columns
+        if os.path.exists(xlsx_path):
+            os.replace(xlsx_path, os.path.join(converted_dir, xlsx_name))
+            print(f"Moved {xlsx_path} to {converted_dir}.")
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=16)
-                df2.columns = columns
-                df = pd.concat([df, df2])
+        return csv_path
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+    def save_all_data(self):
+        for table_name in self.table:
+            for county_name in self.county:
+                self.save_xlsx(table_name, county_name)
+                df = self.xlsx_to_df(table_name, county_name)
+                self.df_to_csv(df, table_name, county_name)
 
-        elif table_name == "17_６歲以上在學人口之在學地與經常居住地概況":
-            df = pd.read_excel(xlsx_path, skiprows=19)
+    def save_all_data_concurrent(
+        self, download_workers=8, host_limit=4, convert_workers=None
+    ):
+        tasks = [
+            (table_name, county_name)
+            for table_name in self.table
+            for county_name in self.county
+            if not self.is_converted(table_name, county_name)
+        ]
+
+        print(f"{len(self.table) * len(self.county) - len(tasks)} already converted.")
+
+        # 同一個host最多host_limit個同時連線
+        host_semaphore = {
+            host: threading.BoundedSemaphore(host_limit)
+            for host in {urlparse(self.get_xlsx_url(*task)).netloc for task in tasks}
+        }
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "同現住鄉鎮市區",
-                "同現住縣市不同鄉鎮市區",
-                "不同縣市或國外地區",
-                "年月",
-                "縣市",
-                "col8",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-            ]
+        def download(table_name, county_name):
+            # 已下載且檔案完整則跳過
+            if self.is_valid_xlsx(self.get_xlsx_path(table_name, county_name)):
+                return
 
-            df.columns = columns
+            host = urlparse(self.get_xlsx_url(table_name, county_name)).netloc
 
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=15)
-                df2.columns = columns
-                df = pd.concat([df, df2])
+            with host_semaphore[host]:
+                self.save_xlsx(table_name, county_name)
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+        failed = []
 
-        elif table_name == "18_６歲以上跨鄉鎮市區通學人口之年齡結構":
-            df = pd.read_excel(xlsx_path, skiprows=16)
+        # 下載(thread)與轉檔(process)同時進行
+        # 轉檔的子行程在下載執行緒執行中才建立，fork 可能複製到被鎖住的 lock，
+        # 改由 forkserver 建立
+        download_pool = ThreadPoolExecutor(download_workers)
+        convert_pool = ProcessPoolExecutor(
+            convert_workers, mp_context=multiprocessing.get_context("forkserver")
+        )
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "６－１１歲",
-                "１２－１４歲",
-                "col5",
-                "１５－１７歲",
-                "１８－２４歲",
-                "２５歲以上",
-                "col9",
-                "年月",
-                "縣市",
-                "col12",
-                "col13",
-                "col14",
-                "col15",
-            ]
+        with download_pool, convert_pool:
+            download_futures = {
+                download_pool.submit(download, *task): task for task in tasks
+            }
+            convert_futures = {}
 
-            df.columns = columns
+            for future in as_completed(download_futures):
+                task = download_futures[future]
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+                try:
+                    future.result()
 
-        elif table_name == "19_６歲以上跨鄉鎮市區通學人口之教育程度":
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "國小及以下",
-                "國（初）中",
-                "高級中等",
-                "大專及以上",
-                "col7",
-                "年月",
-                "縣市",
-                "col10",
-                "col11",
-                "col12",
-            ]
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                df = pd.read_excel(xlsx_path, skiprows=17)
-                columns.insert(5, "col13")
-
-            else:
-                df = pd.read_excel(xlsx_path, skiprows=20)
-
-            df.columns = columns
-
-            if county_name not in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                df2 = pd.read_excel(xlsx_path, sheet_name=1, skiprows=16)
-                df2.columns = columns
-                df = pd.concat([df, df2])
+                except Exception as e:
+                    print(f"Download failed: {task}: {e}")
+                    failed.append(task)
+                    continue
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+                convert_futures[
+                    convert_pool.submit(
+                        convert_xlsx, self.data_dir, self.excel_engine, *task
+                    )
+                ] = task
 
-        elif table_name == "20_５歲以上常住人口遷徙情形":
-            df = pd.read_excel(xlsx_path, skiprows=16)
+            for future in as_completed(convert_futures):
+                task = convert_futures[future]
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "同現住處所",
-                "同現住鄉鎮市區不同處所",
-                "col5",
-                "同現住縣市不同鄉鎮市區",
-                "不同縣市",
-                "大陸地區（含港澳）及國外地區",
-                "col9",
-                "年月",
-                "縣市",
-                "col12",
-                "col13",
-                "col14",
-                "col15",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "21_學齡前兒童幼托及照顧概況":
-            df = pd.read_excel(xlsx_path, skiprows=18)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "已上幼兒園",
-                "未上幼兒園合計",
-                "未上幼兒園（托育）",
-                "未上幼兒園（由家人照顧）",
-                "年月",
-                "縣市",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-            ]
-
-            df.columns = columns
-
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                for sheet_name in [1, 2]:
-                    df2 = pd.read_excel(xlsx_path, sheet_name=sheet_name, skiprows=14)
-                    df2.columns = columns
-                    df = pd.concat([df, df2])
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name in [
-            "22_常住人口長期照顧需求者概況",
-            "23_６５歲以上常住人口長期照顧需求者概況",
-        ]:
-            df = pd.read_excel(xlsx_path, skiprows=16)
+                try:
+                    future.result()
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "需長期照顧人數（人）",
-                "每百位需長期照顧人口有吃飯障礙之相對人次（人 / 百人） ",
-                "每百位需長期照顧人口有上下床障礙之相對人次（人 / 百人） ",
-                "每百位需長期照顧人口有穿脫衣服障礙之相對人次（人 / 百人） ",
-                "每百位需長期照顧人口有上廁所障礙之相對人次（人 / 百人） ",
-                "col7",
-                "每百位需長期照顧人口有洗澡障礙之相對人次（人 / 百人） ",
-                "每百位需長期照顧人口有在室內外走動障礙之相對人次（人 / 百人） ",
-                "每百位需長期照顧人口有備餐（煮飯）障礙之相對人次（人 / 百人） ",
-                "每百位需長期照顧人口有洗（含晾曬）衣服障礙之相對人次（人 / 百人） ",
-                "每百位需長期照顧人口有處理家務（打掃、擦桌等清潔工作）障礙之相對人次（人 / 百人） ",
-                "col13",
-                "年月",
-                "縣市",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["需長期照顧人數（人）"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name in [
-            "24_１５歲以上常住人口與現有子女之居住概況",
-            "25_６５歲以上常住人口與現有子女之居住概況",
-        ]:
-            df = pd.read_excel(xlsx_path, skiprows=16)
+                except Exception as e:
+                    print(f"Convert failed: {task}: {e}")
+                    failed.append(task)
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "有子女者，與其居住距離最近的子女之居住地點（合計）",
-                "有子女者，與其居住距離最近的子女之居住地點（同居住處所）",
-                "有子女者，與其居住距離最近的子女之居住地點（同鄉鎮市區不同處所）",
-                "col6",
-                "有子女者，與其居住距離最近的子女之居住地點（同縣市不同鄉鎮市區）",
-                "有子女者，與其居住距離最近的子女之居住地點（其他縣市）",
-                "有子女者，與其居住距離最近的子女之居住地點（大陸地區（含港澳）及其他）",
-                "無子女者",
-                "col11",
-                "年月",
-                "縣市",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "26_６５歲以上常住人口之居住概況":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "僅與配偶或同居伴侶同住",
-                "與子女同住",
-                "col5",
-                "與親友同住",
-                "獨居",
-                "其他",
-                "col9",
-                "年月",
-                "縣市",
-                "col12",
-                "col13",
-                "col14",
-                "col15",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name in [
-            "27_身心障礙常住人口之性別及年齡結構",
-            "28_原住民族常住人口之性別及年齡結構",
-        ]:
-            df = pd.read_excel(xlsx_path, skiprows=16)
+        print(f"Done: {len(tasks) - len(failed)}/{len(tasks)}, failed: {len(failed)}")
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "男",
-                "女",
-                "col5",
-                "未滿２５歲",
-                "２５－４４歲",
-                "４５－６４歲",
-                "６５歲以上",
-                "col10",
-                "年月",
-                "縣市",
-                "col13",
-                "col14",
-                "col15",
-                "col16",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "29_常住人口之國籍分布":
-            return None
+        return failed
 
-        elif table_name == "30_外國籍與大陸港澳配偶常住人口數":
-            return None
+    def convert_all(self, workers=None):
+        # xlsx或converted資料夾中有檔案的都重新轉檔
+        tasks = [
+            (table_name, county_name)
+            for table_name in self.table
+            for county_name in self.county
+            if os.path.exists(self.get_xlsx_path(table_name, county_name))
+            or os.path.exists(self.get_xlsx_path(table_name, county_name, True))
+        ]
 
-        elif table_name == "31_住戶數、常住人口數及平均每戶人口數":
-            df = pd.read_excel(xlsx_path, skiprows=16)
+        timing = {}
+        failed = {}
+        start = time.perf_counter()
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計-戶數（戶）",
-                "總計-常住人口數（人）",
-                "總計-平均每戶人口數（人 / 戶）",
-                "普通住戶-戶數（戶）",
-                "col6",
-                "普通住戶-常住人口數（人）",
-                "普通住戶-平均每戶人口數（人 / 戶）",
-                "非普通住戶-戶數（戶）",
-                "非普通住戶-常住人口數（人）",
-                "非普通住戶-平均每戶人口數（人 / 戶）",
-                "col12",
-                "年月",
-                "縣市",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-                "col22",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計-戶數（戶）"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name == "32_普通住戶之戶內人口數":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "１人",
-                "２人",
-                "３人",
-                "col6",
-                "４人",
-                "５人",
-                "６人以上",
-                "平均每戶人口數（人 / 戶）",
-                "col11",
-                "年月",
-                "縣市",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-            ]
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {
+                pool.submit(convert_xlsx, self.data_dir, self.excel_engine, *task): task
+                for task in tasks
+            }
 
-            df.columns = columns
+            for future in as_completed(futures):
+                task = futures[future]
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+                try:
+                    timing[task] = future.result()
 
-        elif table_name == "33_普通住戶之家戶型態":
-            df = pd.read_excel(xlsx_path, skiprows=16)
+                except Exception as e:
+                    print(f"Convert failed: {task}: {e}")
+                    failed[task] = repr(e)
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "核心家戶-合計",
-                "核心家戶-夫婦、配偶或同居伴侶",
-                "核心家戶-父母與未婚子女",
-                "核心家戶-父（或母）與未婚子女（單親家庭）",
-                "主幹家戶-合計",
-                "col8",
-                "主幹家戶-袓父母、父母及未婚子女",
-                "主幹家戶-父母與已婚子女",
-                "主幹家戶-袓父母與未婚孫子女（隔代家庭）",
-                "單人家戶",
-                "其他家戶-合計",
-                "其他家戶-有親屬關係",
-                "其他家戶-無親屬關係",
-                "col16",
-                "年月",
-                "縣市",
-                "col19",
-                "col20",
-                "col21",
-                "col22",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "34_普通住戶之住宅所有權屬":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "自有",
-                "不住在一起的配偶、父母或子女所擁有",
-                "col5",
-                "租用",
-                "配住或其他（含借住）",
-                "col8",
-                "年月",
-                "縣市",
-                "col11",
-                "col12",
-                "col13",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name == "35_普通住戶住進現宅時間":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "７９年以前",
-                "８０－８９年",
-                "９０－９９年",
-                "col6",
-                "１００－１０４年",
-                "１０５－１０８年",
-                "１０９年",
-                "col10",
-                "年月",
-                "縣市",
-                "col13",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name == "36_普通住戶在家上網情形":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "家裡可以上網（戶）",
-                "每百戶普通住戶有桌上型電腦之相對戶數（戶 / 百戶）",
-                "每百戶普通住戶有筆記型電腦之相對戶數（戶 / 百戶）",
-                "每百戶普通住戶有平板電腦之相對戶數（戶 / 百戶）",
-                "col7",
-                "每百戶普通住戶有手機之相對戶數（戶 / 百戶）",
-                "每百戶普通住戶有智慧型家電之相對戶數（戶 / 百戶）",
-                "每百戶普通住戶有其他上網設備之相對戶數（戶 / 百戶）",
-                "家裡無法上網（戶）",
-                "col12",
-                "年月",
-                "縣市",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-            ]
+        elapsed = time.perf_counter() - start
 
-            df.columns = columns
+        print(
+            f"Converted {len(timing)}/{len(tasks)} in {elapsed:.1f}s "
+            f"(task time {sum(timing.values()):.1f}s), failed: {len(failed)}"
+        )
 
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
+        for task, seconds in sorted(timing.items(), key=lambda x: -x[1])[:5]:
+            print(f"Slowest: {task}: {seconds:.2f}s")
 
-        elif table_name == "37_住宅使用情形":
-            df = pd.read_excel(xlsx_path, skiprows=16)
+        return timing, failed
 
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "有人經常居住住宅",
-                "無人經常居住住宅-合計",
-                "col5",
-                "無人經常居住住宅-偶爾自住",
-                "無人經常居住住宅-自住以外用途（如辦公室、倉庫等）",
-                "無人經常居住住宅-目前沒有使用",
-                "col9",
-                "年月",
-                "縣市",
-                "col12",
-                "col13",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name in ["38_住宅之竣工年份", "41_空閒住宅之竣工年份"]:
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "６９年以前",
-                "７０－７９年",
-                "８０－８９年",
-                "col6",
-                "９０－９９年",
-                "１００－１０９年合計",
-                "１００－１０４年",
-                "１０５－１０９年",
-                "col11",
-                "年月",
-                "縣市",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name in ["39_住宅之樓地板面積", "42_空閒住宅之樓地板面積"]:
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "未滿６０平方公尺",
-                "６０－未滿１２０平方公尺",
-                "col5",
-                "１２０－未滿１８０平方公尺",
-                "１８０－未滿３００平方公尺",
-                "３００平方公尺以上",
-                "平均每宅面積（平方公尺 / 宅）",
-                "col10",
-                "年月",
-                "縣市",
-                "col13",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name == "40_住宅之建築類型":
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "平房",
-                "２－５樓",
-                "６－１２樓",
-                "１３樓以上",
-                "年月",
-                "縣市",
-                "col9",
-                "col10",
-                "col11",
-                "col12",
-                "col13",
-                "col14",
-                "col15",
-            ]
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                df = pd.read_excel(xlsx_path, skiprows=16)
-                columns.insert(5, "col16")
-
-            else:
-                df = pd.read_excel(xlsx_path, skiprows=18)
-
-            df.columns = columns
-
-            if county_name in ["新北市", "臺中市", "臺南市", "高雄市", "屏東縣"]:
-                for sheet_name in [1, 2]:
-                    df2 = pd.read_excel(xlsx_path, sheet_name=sheet_name, skiprows=14)
-                    df2.columns = columns
-                    df = pd.concat([df, df2])
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name == "43_有人經常居住住宅之使用情形":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "住宅專用",
-                "住宅兼其他用途-合計",
-                "col5",
-                "住宅兼其他用途-兼工業用",
-                "住宅兼其他用途-兼商業或服務業用",
-                "住宅兼其他用途-兼農業用",
-                "col9",
-                "年月",
-                "縣市",
-                "col12",
-                "col13",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-                "col22",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name == "44_有人經常居住住宅之居住人數":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "１人",
-                "２人",
-                "３人",
-                "col6",
-                "４人",
-                "５人",
-                "６人以上",
-                "平均每宅居住人口數（人 / 宅）",
-                "col11",
-                "年月",
-                "縣市",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-                "col22",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-        elif table_name == "45_有人經常居住住宅之房廳數":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "１間",
-                "２間",
-                "３間",
-                "col6",
-                "４間",
-                "５間",
-                "６間以上",
-                "平均每宅房廳數（間 / 宅）",
-                "col11",
-                "年月",
-                "縣市",
-                "col14",
-                "col15",
-                "col16",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-                "col22",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
-
-        elif table_name == "46_有人經常居住住宅之平均每人使用房廳數及衛浴套數":
-            df = pd.read_excel(xlsx_path, skiprows=16)
-
-            columns = [
-                "col0",
-                "鄉鎮市區",
-                "總計",
-                "每人使用房廳數-未滿１間",
-                "每人使用房廳數-１－未滿２間",
-                "每人使用房廳數-２－未滿３間",
-                "每人使用房廳數-３間以上",
-                "每人使用房廳數-平均每人使用房廳數（間 / 人）",
-                "col8",
-                "每人使用衛浴套數-未滿０. ５套",
-                "每人使用衛浴套數-０. ５－未滿１套",
-                "每人使用衛浴套數-１－未滿２套",
-                "每人使用衛浴套數-２套以上",
-                "每人使用衛浴套數-平均每人使用衛浴套數（套 / 人）",
-                "col14",
-                "年月",
-                "縣市",
-                "col17",
-                "col18",
-                "col19",
-                "col20",
-                "col21",
-                "col22",
-                "col23",
-                "col24",
-                "col25",
-            ]
-
-            df.columns = columns
-
-            df = df.dropna(subset=["總計"])
-            df = df.replace("　", "", regex=True)
-
-            if county_name in [
-                "基隆市",
-                "新竹市",
-                "嘉義市",
-                "澎湖縣",
-                "金門縣",
-                "連江縣",
-            ]:
-                num = self.number_of_district[county_name]
-                df = df[:num]
+    def get_manifest(self):
+        manifest_path = os.path.join(self.data_dir, "manifest.json")
 
-        else:
-            raise
+        if not os.path.exists(manifest_path):
+            return {}
 
-        # 填入年月與縣市
-        df["年月"] = "109-11"
-        df["縣市"] = county_name
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)
 
-        # 選擇需要的欄位
-        df = df[self.column[table_name]]
+    def save_manifest(self, manifest):
+        manifest_path = os.path.join(self.data_dir, "manifest.json")
+        tmp_path = f"{manifest_path}.part"
 
-        # 檢查行政區數目
-        if len(df) != self.number_of_district[county_name]:
-            raise ValueError(
-                f"行政區數目錯誤：{county_name}({len(df)}/{self.number_of_district[county_name]})"
-            )
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=4)
 
-        # 檢查空值
-        if df.isnull().any().any():
-            raise ValueError("DataFrame contains empty (NaN) values.")
+        os.replace(tmp_path, manifest_path)
 
-        return df
+    def get_file_hash(self, path):
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
 
-    def df_to_csv(self, df, table_name, county_name):
-        xlsx_dir = os.path.join(self.data_dir, table_name, "xlsx")
-        xlsx_name = f"{table_name}_{county_name}.xlsx"
-        xlsx_path = os.path.join(xlsx_dir, xlsx_name)
+    def update_xlsx(self, table_name, county_name, record):
+        url = self.get_xlsx_url(table_name, county_name)
+        headers = {}
 
-        csv_dir = os.path.join(self.data_dir, table_name)
-        csv_name = f"{table_name}_{county_name}.csv"
-        csv_path = os.path.join(csv_dir, csv_name)
+        # 本機還有xlsx時才用上次的驗證資訊做條件式請求
+        has_xlsx = self.is_valid_xlsx(
+            self.get_xlsx_path(table_name, county_name)
+        ) or self.is_valid_xlsx(self.get_xlsx_path(table_name, county_name, True))
 
-        # 儲存csv
-        df.to_csv(csv_path, index=False)
-        print(f"Saved {csv_path}.")
+        if not has_xlsx:
+            record.pop("xlsx_sha256", None)
 
-        # # 壓縮xlsx
-        # zip_path = xlsx_path.replace(".xlsx", ".zip")
-        # os.system(f"zip {zip_path} {xlsx_path}")
-        # print(f"Saved {zip_path}.")
+        elif record.get("etag"):
+            headers["If-None-Match"] = record["etag"]
 
-        # 將xlsx移到converted資料夾
-        converted_dir = os.path.join(self.data_dir, table_name, "xlsx", "converted")
-        os.makedirs(converted_dir, exist_ok=True)
-        os.system(f"mv {xlsx_path} {converted_dir}")
-        print(f"Moved {xlsx_path} to {converted_dir}.")
+        if has_xlsx and record.get("last_modified"):
+            headers["If-Modified-Since"] = record["last_modified"]
+
+        print("URL:", url)
+        response = fetch.get(url, headers=headers)
+
+        if response.status_code == 304:
+            return False
+
+        if response.status_code != 200:
+            raise Exception(
+                f"Failed to download file. Status code: {response.status_code}"
+            )
+
+        record["url"] = url
+        record["etag"] = response.headers.get("ETag")
+        record["last_modified"] = response.headers.get("Last-Modified")
+
+        # 伺服器沒有驗證資訊時以內容hash判斷
+        xlsx_hash = hashlib.sha256(response.content).hexdigest()
+
+        if xlsx_hash == record.get("xlsx_sha256"):
+            return False
+
+        self.write_xlsx(table_name, county_name, response.content)
+        record["xlsx_sha256"] = xlsx_hash
+
+        return True
+
+    def update_all_data(self):
+        manifest = self.get_manifest()
+        changed_tables = set()
 
-    def save_all_data(self):
         for table_name in self.table:
             for county_name in self.county:
-                self.save_xlsx(table_name, county_name)
+                key = f"{table_name}/{county_name}"
+                record = manifest.setdefault(key, {})
+                csv_path = self.get_csv_path(table_name, county_name)
+
+                changed = self.update_xlsx(table_name, county_name, record)
+
+                # csv不存在或被修改過也要重新轉檔
+                if not changed and (
+                    not os.path.exists(csv_path)
+                    or self.get_file_hash(csv_path) != record.get("csv_sha256")
+                ):
+                    changed = True
+
+                if not changed:
+                    print(f"Unchanged: {key}")
+                    continue
+
                 df = self.xlsx_to_df(table_name, county_name)
-                self.df_to_csv(df, table_name, county_name)
+                csv_path = self.df_to_csv(df, table_name, county_name)
+                record["csv_sha256"] = self.get_file_hash(csv_path)
+                changed_tables.add(table_name)
+
+                # 每個檔案完成就存檔，中斷後可接續
+                self.save_manifest(manifest)
+
+        self.save_manifest(manifest)
+        self.save_merged_data(changed_tables)
+
+        return changed_tables
 
-    def save_merged_data(self):
-        merged_tables = {
+    def table_to_df(self, table_name):
+        import pandas as pd
+
+        # 同一表格的所有縣市只concat一次
+        return pd.concat(
+            [self.xlsx_to_df(table_name, county_name) for county_name in self.county],
+            ignore_index=True,
+        )
+
+    def get_merged_tables(self):
+        return {
             # "1_2_3_4_常住人口": {
             #     "tables": [
             #         "1_常住人口數及人口密度",
@@ -2229,53 +2264,80 @@ class PopulationAndHousingCensus:
             }
         }
 
+    def save_merged_data(self, changed_tables=None):
+        import pandas as pd
+
+        merged_tables = self.get_merged_tables()
+        keys = ["年月", "縣市", "鄉鎮市區"]
+
         for merged_table_name in merged_tables:
-            df_merged = pd.DataFrame()
+            csv_path = sink.get_path(
+                os.path.join(self.data_dir, f"{merged_table_name}.csv")
+            )
+
+            # 只重建有輸入表格變動的合併表
+            if (
+                changed_tables is not None
+                and os.path.exists(csv_path)
+                and not set(merged_tables[merged_table_name]["tables"]) & changed_tables
+            ):
+                print(f"Unchanged: {merged_table_name}")
+                continue
+
+            output_columns = merged_tables[merged_table_name]["columns"]
+            dfs = []
 
             for table_name in merged_tables[merged_table_name]["tables"]:
-                df_table = pd.DataFrame()
-
-                for county_name in self.county:
-                    # self.save_xlsx(table_name, county_name)
-                    df_county = self.xlsx_to_df(table_name, county_name)
-
-                    # 避免欄位名稱重複
-                    df_county.columns = [
-                        (
-                            f"{table_name.split('_')[0]}_{col}"
-                            if col not in ["年月", "縣市", "鄉鎮市區"]
-                            else col
-                        )
-                        for col in df_county.columns
+                df_table = self.table_to_df(table_name)
+
+                # 避免欄位名稱重複
+                prefix = table_name.split("_")[0]
+                df_table.columns = [
+                    f"{prefix}_{col}" if col not in keys else col
+                    for col in df_table.columns
+                ]
+
+                # 合併前只保留輸出需要的欄位
+                df_table = df_table[
+                    keys
+                    + [
+                        col
+                        for col in df_table.columns
+                        if col in output_columns and col not in keys
                     ]
+                ]
 
-                    # 合併不同縣市資料
-                    df_table = pd.concat([df_table, df_county], ignore_index=True)
+                # key轉成categorical後作為index，合併時只比對index
+                df_table = df_table.astype({key: "category" for key in keys})
+                dfs.append(df_table.set_index(keys))
 
-                if df_merged.empty:
-                    df_merged = df_table
-
-                else:
-                    df_merged = pd.merge(
-                        df_merged,
-                        df_table,
-                        on=["年月", "縣市", "鄉鎮市區"],
-                        how="inner",
-                    )
+            # 一次依index對齊所有表格（inner join）
+            df_merged = pd.concat(dfs, axis=1, join="inner").reset_index()
 
-            # 刪除重複欄位，改欄位名稱
-            df_merged = df_merged[merged_tables[merged_table_name]["columns"].keys()]
-            df_merged = df_merged.rename(
-                columns=merged_tables[merged_table_name]["columns"]
-            )
+            # 排序欄位，改欄位名稱
+            df_merged = df_merged[list(output_columns)]
+            df_merged = df_merged.rename(columns=output_columns)
 
             # 存檔
-            csv_path = os.path.join(self.data_dir, f"{merged_table_name}.csv")
-            df_merged.to_csv(csv_path, index=False)
+            sink.write(df_merged, csv_path)
             print(f"Saved {csv_path}.")
 
 
+# ProcessPoolExecutor需要可pickle的module層級函式
+def convert_xlsx(data_dir, excel_engine, table_name, county_name):
+    start = time.perf_counter()
+
+    census = PopulationAndHousingCensus(data_dir, excel_engine)
+    df = census.xlsx_to_df(table_name, county_name)
+    census.df_to_csv(df, table_name, county_name)
+
+    return time.perf_counter() - start
+
+
 if __name__ == "__main__":
     population_and_housing_census = PopulationAndHousingCensus(data_dir="data")
     # population_and_housing_census.save_all_data()
+    # population_and_housing_census.save_all_data_concurrent()
+    # population_and_housing_census.convert_all(workers=os.cpu_count())
+    # population_and_housing_census.update_all_data()
     population_and_housing_census.save_merged_data()
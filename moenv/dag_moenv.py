@@ -4,7 +4,6 @@ from datetime import timezone, timedelta, datetime
 import sys
 
 sys.path.insert(0, "/opt/airflow/script/moenv")
-from etl_moenv import ETL_moenv
 
 
 default_args = {
@@ -15,17 +14,21 @@ default_args = {
 }
 
 
+# 所有資料集在同一個 task 內並行抓取，新增資料集只要加到這裡
+codes = ["aqx_p_04"]
+
+
 def run_etl_moenv():
-    etl_moenv = ETL_moenv(
-        code="aqx_p_04",
+    # scheduler 每次解析 DAG 都會執行模組層級的程式，爬蟲等到 task 執行時才 import
+    from etl_moenv import run_all
+
+    run_all(
+        codes,
         api_key="",
         data_dir_path="/opt/airflow/data/moenv",
-        checkpoint_path="/opt/airflow/checkpoint/moenv/checkpoint.json",
+        checkpoint_dir="/opt/airflow/checkpoint/moenv",
     )
 
-    json_data = etl_moenv.save_json()
-    etl_moenv.save_csv(json_data)
-
 
 with DAG(
     f"Crawler_moenv",
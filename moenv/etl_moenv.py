@@ -1,13 +1,28 @@
 import os
-import requests
+import sys
 import json
+import time
 from datetime import datetime, timedelta, timezone
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
 
 
 class ETL_moenv:
+    # 歷史資料每頁 1000 筆，相鄰兩頁重疊的筆數；抓取期間新增的資料少於此數時不用重抓
+    page_overlap = 100
+
     def __init__(
-        self, code, api_key, data_dir_path="data", checkpoint_path="checkpoint.json"
+        self,
+        code,
+        api_key,
+        data_dir_path="data",
+        checkpoint_path="checkpoint.json",
+        legacy_checkpoint_path=None,
     ):
         self.prefix = "moenv"
         self.code = code
@@ -17,6 +32,14 @@ class ETL_moenv:
         os.makedirs(os.path.join(self.data_dir_path, "json"), exist_ok=True)
         self.checkpoint_path = checkpoint_path
 
+        # checkpoint_path 還不存在時沿用舊檔名的 checkpoint，更新後就寫到新檔名
+        self.legacy_checkpoint_path = legacy_checkpoint_path
+
+        # 上次回應的 ETag/Last-Modified/內容hash，和 checkpoint 放在一起
+        self.cache_path = os.path.join(
+            os.path.dirname(checkpoint_path), f"fetch_cache_{code}.json"
+        )
+
     def get_url(self):
         base_url = "https://data.moenv.gov.tw/api/v2"
         return f"{base_url}/{self.code}?api_key={self.api_key}"
@@ -32,21 +55,73 @@ class ETL_moenv:
             return os.path.join(self.data_dir_path, "json", file_name)
 
     def get_checkpoint(self):
-        with open(self.checkpoint_path, "r") as f:
-            return json.load(f)
+        # {"sites": {siteid: 最新的 datacreationdate}}
+        checkpoint_path = self.checkpoint_path
+
+        if not os.path.exists(checkpoint_path) and self.legacy_checkpoint_path:
+            checkpoint_path = self.legacy_checkpoint_path
+
+        if not os.path.exists(checkpoint_path):
+            return {"sites": {}}
+
+        with open(checkpoint_path, "r") as f:
+            checkpoint = json.load(f)
+
+        # 舊格式只記一筆 (siteid, datacreationdate)，當作所有測站的預設值
+        if "sites" not in checkpoint:
+            checkpoint = {
+                "sites": {},
+                "default": checkpoint.get("datacreationdate"),
+            }
+
+        return checkpoint
+
+    def update_checkpoint(self, checkpoint):
+        with open(f"{self.checkpoint_path}.part", "w") as f:
+            json.dump(checkpoint, f, ensure_ascii=False, indent=4)
+
+        os.replace(f"{self.checkpoint_path}.part", self.checkpoint_path)
+
+    def filter_new_data(self, json_data, checkpoint):
+        import pandas as pd
+
+        if not json_data:
+            return [], checkpoint
+
+        df = pd.DataFrame(
+            {
+                "siteid": [item["siteid"] for item in json_data],
+                "datacreationdate": [item["datacreationdate"] for item in json_data],
+            }
+        )
+        dates = pd.to_datetime(df["datacreationdate"], format="%Y-%m-%d %H:%M")
+
+        # 每筆資料和所屬測站的 checkpoint 比較一次，與資料順序無關
+        latest = df["siteid"].map(checkpoint["sites"])
+
+        if checkpoint.get("default"):
+            latest = latest.fillna(checkpoint["default"])
+
+        latest = pd.to_datetime(latest, format="%Y-%m-%d %H:%M")
+        mask = (latest.isna() | (dates > latest)) & ~df.duplicated()
 
-    def update_checkpoint(self, newest_data):
-        newest_data = {
-            "siteid": newest_data["siteid"],
-            "datacreationdate": newest_data["datacreationdate"],
-        }
+        filtered_data = [json_data[i] for i in mask.to_numpy().nonzero()[0]]
 
-        with open(self.checkpoint_path, "w") as f:
-            json.dump(newest_data, f, ensure_ascii=False, indent=4)
+        # 更新各測站最新的時間
+        newest = dates[mask].groupby(df["siteid"][mask]).max()
+        sites = dict(checkpoint["sites"])
+        sites.update(newest.dt.strftime("%Y-%m-%d %H:%M").to_dict())
+
+        return filtered_data, {**checkpoint, "sites": sites}
 
     def save_json(self):
         print("URL:", self.url)
-        response = requests.get(self.url)
+        response = fetch.get_if_changed(self.url, self.cache_path)
+
+        # 和上次相同，不用解析
+        if response is None:
+            print("No new data")
+            return None
 
         if response.status_code == 200:
             # 1. get json data
@@ -55,14 +130,7 @@ class ETL_moenv:
             checkpoint = self.get_checkpoint()
 
             # 2. drop data before checkpoint
-            filtered_data = []
-            for item in json_data:
-                if (
-                    item["siteid"] == checkpoint["siteid"]
-                    and item["datacreationdate"] == checkpoint["datacreationdate"]
-                ):
-                    break
-                filtered_data.append(item)
+            filtered_data, checkpoint = self.filter_new_data(json_data, checkpoint)
 
             # 3. save filtered json data
             if len(filtered_data) > 0:
@@ -72,26 +140,123 @@ class ETL_moenv:
                 print(f"json saved: {json_path}")
 
                 # 4. update checkpoint
-                self.update_checkpoint(filtered_data[0])
+                self.update_checkpoint(checkpoint)
+                fetch.commit(response)
 
                 return filtered_data
 
             else:
+                fetch.commit(response)
                 print("No new data")
-                exit()
+                return None
 
         else:
-            print("Error:", response.status_code)
+            raise RuntimeError(f"Error: {response.status_code} ({self.code})")
 
     def save_csv(self, json_data):
+        import pandas as pd
+
         df = pd.DataFrame(json_data)
-        csv_path = self.get_data_path("csv")
-        df.to_csv(csv_path, index=False)
+        csv_path = sink.write(df, self.get_data_path("csv"))
         print(f"csv saved: {csv_path}")
 
-    def save_history_data(self, start="2000-01-01", end="2030-12-31"):
-        filtered_data = []
-        offset = 0
+    def run(self):
+        json_data = self.save_json()
+
+        if json_data:
+            self.save_csv(json_data)
+
+        return len(json_data or [])
+
+    def get_page(self, offset):
+        url = f"{self.url}&offset={offset}"
+        print("URL:", url)
+
+        response = fetch.get(url)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Error: {response.status_code} (offset={offset})")
+
+        return response.json()["records"]
+
+    def get_record_date(self, offset):
+        # 只取一筆，超過資料筆數時回傳 None
+        url = f"{self.url}&limit=1&offset={offset}"
+        response = fetch.get(url)
+
+        if response.status_code != 200:
+            raise RuntimeError(f"Error: {response.status_code} (offset={offset})")
+
+        records = response.json()["records"]
+
+        if not records:
+            return None
+
+        return datetime.strptime(records[0]["datacreationdate"], "%Y-%m-%d %H:%M")
+
+    def find_offset(self, is_past, lo=0):
+        # 資料由新到舊，找第一個 is_past(date) 成立(或超過資料筆數)的 offset
+        def check(offset):
+            date = self.get_record_date(offset)
+            return date is None or is_past(date)
+
+        if check(lo):
+            return lo
+
+        # 先倍增找上界，再二分搜尋: check(lo) 不成立、check(hi) 成立
+        step = 1
+
+        while not check(lo + step):
+            lo += step
+            step *= 2
+
+        hi = lo + step
+
+        while hi - lo > 1:
+            mid = (lo + hi) // 2
+
+            if check(mid):
+                hi = mid
+            else:
+                lo = mid
+
+        return hi
+
+    def get_history_name(self, start, end):
+        return f"{self.prefix}_{self.code}_{start}_{end}"
+
+    def get_progress(self, progress_path):
+        if not os.path.exists(progress_path):
+            return {"offset": None, "done": False}
+
+        with open(progress_path) as f:
+            return json.load(f)
+
+    def save_progress(self, progress_path, progress):
+        with open(f"{progress_path}.part", "w") as f:
+            json.dump(progress, f, indent=4)
+
+        os.replace(f"{progress_path}.part", progress_path)
+
+    def save_history_page(self, df, dates, history_name):
+        csv_dir = os.path.join(self.data_dir_path, history_name)
+        json_dir = os.path.join(self.data_dir_path, "json", history_name)
+        os.makedirs(json_dir, exist_ok=True)
+
+        # 依月份附加到各自的檔案
+        for month, df_month in df.groupby(dates.dt.strftime("%Y%m"), sort=False):
+            file_name = f"{self.prefix}_{self.code}_{month}"
+
+            json_path = os.path.join(json_dir, f"{file_name}.jsonl")
+            df_month.to_json(
+                json_path, orient="records", lines=True, force_ascii=False, mode="a"
+            )
+
+            sink.write(df_month, os.path.join(csv_dir, f"{file_name}.csv"), append=True)
+
+    def save_history_data(self, start="2000-01-01", end="2030-12-31", workers=4):
+        import pandas as pd
+
         start_date = datetime.strptime(start, "%Y-%m-%d")
         end_date = (
             datetime.strptime(end, "%Y-%m-%d")
@@ -99,65 +264,191 @@ class ETL_moenv:
             - timedelta(seconds=1)
         )
 
-        # 1. get json data be
-        should_continue = True
+        history_name = self.get_history_name(start, end)
+        progress_path = os.path.join(
+            self.data_dir_path, f"{history_name}.progress.json"
+        )
 
-        while should_continue:
-            url = f"{self.url}&offset={offset}"
-            print("URL:", url)
+        # 從上次中斷的 offset 繼續
+        progress = self.get_progress(progress_path)
 
-            response = requests.get(url)
+        if progress["done"]:
+            print(f"Already done: {history_name}")
+            return
 
-            if response.status_code == 200:
-                json_data = response.json()["records"]
-                checkpoint = self.get_checkpoint()
+        # 舊格式(或還沒存過資料)的進度檔沒有 oldest，無法判斷第一頁和前面是否接續，
+        # 直接從存的 offset 繼續
+        check_gap = progress["offset"] is None or progress.get("oldest") is not None
 
-                for data in json_data:
-                    data_date = datetime.strptime(
-                        data["datacreationdate"], "%Y-%m-%d %H:%M"
-                    )
+        # 用單筆查詢二分搜尋 end、start 的 offset，只抓範圍內的頁
+        if progress["offset"] is None:
+            first_offset = self.find_offset(lambda date: date <= end_date)
+            progress["end_offset"] = self.find_offset(
+                lambda date: date < start_date, first_offset
+            )
 
-                    if start_date <= data_date <= end_date:
-                        filtered_data.append(data)
+            # 往前多抓一些，搜尋後才新增的資料不會讓開頭漏掉
+            progress["offset"] = max(0, first_offset - self.page_overlap)
 
-                    elif data_date > end_date:
-                        continue
+        if progress.get("end_offset") is None:
+            progress["end_offset"] = self.find_offset(
+                lambda date: date < start_date, progress["offset"]
+            )
+
+        progress.setdefault("oldest", None)
+        progress.setdefault("oldest_sites", [])
+        self.save_progress(progress_path, progress)
+
+        print(
+            f"Offsets: {progress['offset']} - {progress['end_offset']} "
+            f"({history_name})"
+        )
+
+        stride = 1000 - self.page_overlap
+        saved = 0
+        done = False
+
+        def is_saved(date, siteid):
+            # 比 end 新，或已經存過
+            if date > end_date:
+                return True
+
+            if progress["oldest"] is None:
+                return False
+
+            oldest = pd.Timestamp(progress["oldest"])
+            return date > oldest or (
+                date == oldest and siteid in progress["oldest_sites"]
+            )
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while not done:
+                # 一次平行抓 workers 頁，依序處理，記憶體用量固定
+                pages_left = -(-(progress["end_offset"] - progress["offset"]) // stride)
+                offsets = [
+                    progress["offset"] + i * stride
+                    for i in range(max(1, min(workers, pages_left)))
+                ]
+
+                for offset, json_data in zip(offsets, pool.map(self.get_page, offsets)):
+                    if not json_data:
+                        done = True
+                        break
 
-                    else:
-                        should_continue = False
+                    df = pd.DataFrame(json_data)
+                    dates = pd.to_datetime(
+                        df["datacreationdate"], format="%Y-%m-%d %H:%M"
+                    )
+                    mask = (dates >= start_date) & (dates <= end_date)
+
+                    # 每頁的第一筆應該和前面重疊；沒有重疊代表抓取期間新增的資料
+                    # 讓 offset 往後移太多，和上一頁之間有缺口，往前一頁重抓
+                    if (
+                        check_gap
+                        and offset > 0
+                        and not is_saved(dates[0], df["siteid"][0])
+                    ):
+                        progress["offset"] = max(0, offset - 1000)
+                        self.save_progress(progress_path, progress)
+                        print(f"Gap before offset={offset}, refetch.")
                         break
 
-                offset += 1000
+                    # 抓取期間有新資料時 offset 會往後移，跳過已經存過的
+                    if progress["oldest"] is not None:
+                        oldest = pd.Timestamp(progress["oldest"])
+                        mask &= (dates < oldest) | (
+                            (dates == oldest)
+                            & ~df["siteid"].isin(progress["oldest_sites"])
+                        )
 
-            else:
-                print("Error:", response.status_code)
+                    if mask.any():
+                        self.save_history_page(df[mask], dates[mask], history_name)
+                        saved += int(mask.sum())
 
-        # 2. save filtered json data
-        json_path = os.path.join(
-            self.data_dir_path, "json", f"{self.prefix}_{self.code}_{start}_{end}.json"
-        )
+                        oldest = dates[mask].min()
+                        sites = df.loc[mask & (dates == oldest), "siteid"].tolist()
 
-        with open(json_path, "w") as f:
-            json.dump(filtered_data, f, ensure_ascii=False, indent=4)
+                        if str(oldest) != progress["oldest"]:
+                            progress["oldest"] = str(oldest)
+                            progress["oldest_sites"] = []
 
-        print(f"json saved: {json_path}")
+                        progress["oldest_sites"] += sites
+
+                    progress["offset"] = offset + stride
+                    self.save_progress(progress_path, progress)
+                    check_gap = True
+
+                    # 已經比開始日期還舊
+                    if (dates < start_date).any():
+                        done = True
+                        break
 
-        # 3. save csv
-        df = pd.DataFrame(filtered_data)
-        csv_path = os.path.join(
-            self.data_dir_path, f"{self.prefix}_{self.code}_{start}_{end}.csv"
+        progress["done"] = True
+        self.save_progress(progress_path, progress)
+        print(f"Saved {saved} records: {history_name}")
+
+
+# 舊版只處理 aqx_p_04，checkpoint 檔名沒有資料集代碼
+legacy_checkpoint_names = {"aqx_p_04": "checkpoint.json"}
+
+
+def run_all(
+    codes, api_key, data_dir_path="data", checkpoint_dir="checkpoint", workers=8
+):
+    # 多個資料集共用一個 thread pool 和 fetch 的連線池(預設 10 條連線)
+    # 每個資料集有自己的 checkpoint_<code>.json、fetch_cache_<code>.json
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    def run(code):
+        start = time.perf_counter()
+        legacy_name = legacy_checkpoint_names.get(code)
+        etl_moenv = ETL_moenv(
+            code=code,
+            api_key=api_key,
+            data_dir_path=data_dir_path,
+            checkpoint_path=os.path.join(checkpoint_dir, f"checkpoint_{code}.json"),
+            legacy_checkpoint_path=(
+                os.path.join(checkpoint_dir, legacy_name) if legacy_name else None
+            ),
         )
-        df.to_csv(csv_path, index=False)
-        print(f"csv saved: {csv_path}")
+        count = etl_moenv.run()
+        return count, time.perf_counter() - start
+
+    start = time.perf_counter()
+    results = {}
+    errors = {}
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(run, code): code for code in codes}
+
+        for future in as_completed(futures):
+            code = futures[future]
+
+            try:
+                results[code] = future.result()
+
+            except Exception as e:
+                errors[code] = e
+
+    print("Summary:")
+
+    for code in codes:
+        if code in results:
+            count, elapsed = results[code]
+            print(f"  {code}: {count} records, {elapsed:.2f}s")
+
+        else:
+            print(f"  {code}: failed ({errors[code]})")
+
+    print(f"Total: {len(codes)} datasets, {time.perf_counter() - start:.2f}s")
+
+    if errors:
+        raise RuntimeError(f"{len(errors)} datasets failed: {', '.join(errors)}")
+
+    return results
 
 
 if __name__ == "__main__":
-    etl_moenv = ETL_moenv(
-        code="aqx_p_04",
-        api_key="",
-        data_dir_path="data",
-        checkpoint_path="checkpoint.json",
-    )
+    # etl_moenv = ETL_moenv(code="aqx_p_04", api_key="")
     # etl_moenv.save_history_data("2022-01-01", "2024-09-30")
-    json_data = etl_moenv.save_json()
-    etl_moenv.save_csv(json_data)
+    run_all(["aqx_p_04"], api_key="")
@@ -1,16 +1,34 @@
 import sys
 import os
-import requests
 import json
-import pandas as pd
+import copy
+import hashlib
+import threading
 from datetime import datetime, timedelta, timezone
-import pytz
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
 
 # from airflow.exceptions import AirflowFailException
 
 
 class SGEnviron:
+    # 組合資料集同時呼叫多個API時，整組的逾時秒數
+    group_timeout = 60
+
+    # 測站/區域metadata: {f"{api_name}_{kind}": (records, DataFrame)}
+    metadata_cache = {}
+    metadata_lock = threading.Lock()
+
+    # 即時資料用條件式請求，記錄上次回應的 ETag/Last-Modified/內容hash
+    cache_path = os.path.join("data/", "fetch_cache.json")
+    response = None
+
     def __init__(self):
         self.dataset_name = None
         self.api_name = None
@@ -22,7 +40,7 @@ class SGEnviron:
     def set_attrs(self):
         raise NotImplementedError("Subclasses must implement this method")
 
-    def get_json(self, date_str=None):
+    def get_json(self, date_str=None, force=False, rate_limiter=None):
         if date_str:
             url = f"{self.api_url}?date={date_str}"
 
@@ -31,7 +49,21 @@ class SGEnviron:
 
         print(f"URL: {url}")
 
-        response = requests.get(url)
+        if date_str:
+            # 補歷史資料時由 save_history_data 限制每秒請求數
+            if rate_limiter:
+                rate_limiter.wait()
+
+            response = fetch.get(url)
+
+        # 即時資料沒有更新時回傳 None，不用解析
+        else:
+            response = fetch.get_if_changed(url, self.cache_path, force)
+
+            if response is None:
+                return None
+
+            self.response = response
 
         if response.status_code == 200:
             return response.json()
@@ -40,6 +72,41 @@ class SGEnviron:
             print(f"Failed to retrieve data. Status code: {response.status_code}")
             raise
 
+    def get_json_group(self, sg_environs, date_str=None, rate_limiter=None):
+        # 子資料集的API彼此獨立，同時發出請求
+        pool = ThreadPoolExecutor(len(sg_environs))
+        futures = [
+            pool.submit(s.get_json, date_str, rate_limiter=rate_limiter)
+            for s in sg_environs
+        ]
+        done, not_done = wait(futures, timeout=self.group_timeout)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        if not_done:
+            raise TimeoutError(
+                f"{len(not_done)} request(s) not finished in {self.group_timeout}s."
+            )
+
+        json_data_tuple = tuple(future.result() for future in futures)
+
+        # 即時資料全部沒更新才略過；只有部分更新時，沒更新的重新完整抓取
+        if date_str is None and None in json_data_tuple:
+            if all(json_data is None for json_data in json_data_tuple):
+                return None
+
+            json_data_tuple = tuple(
+                s.get_json(force=True) if json_data is None else json_data
+                for s, json_data in zip(sg_environs, json_data_tuple)
+            )
+
+        return json_data_tuple
+
+    def commit(self):
+        # 存檔成功後才記錄這次的回應，失敗時下次仍會重新抓取
+        if self.response is not None:
+            fetch.commit(self.response)
+            self.response = None
+
     def save_json(self, json_data):
         now = datetime.now(timezone(timedelta(hours=8))).hour
 
@@ -64,6 +131,10 @@ class SGEnviron:
         json_data = self.get_json()
         # self.save_json(json_data)
 
+        if json_data is None:
+            print("Not modified, skip.")
+            return
+
         df = self.json_to_df(json_data)
 
         if not df.empty:
@@ -74,39 +145,203 @@ class SGEnviron:
                 f"{self.dataset_name}_{now.year}{now.month:02}{now.day:02}_{now.hour:02}.csv",
             )
 
-            df.to_csv(csv_path, index=False)
+            csv_path = sink.write(df, csv_path)
             print(f"Saved: {csv_path}.")
 
         else:
             print(f"Data for is empty.")
 
-    def save_history_data(self, start_date_str, end_date_str):
+        self.commit()
+
+    def get_ledger_path(self):
+        return os.path.join(self.data_dir_path, "history_ledger.txt")
+
+    def get_ledger(self):
+        # 已完成(含無資料)的日期，每行一個
+        ledger_path = self.get_ledger_path()
+
+        if not os.path.exists(ledger_path):
+            return set()
+
+        with open(ledger_path) as f:
+            return {line.strip() for line in f if line.strip()}
+
+    def save_day_data(self, date_str, rate_limiter=None):
+        json_data = self.get_json(date_str, rate_limiter=rate_limiter)
+        # self.save_json(json_data)
+
+        df = self.json_to_df(json_data)
+
+        if df.empty:
+            print(f"Data for {date_str} is empty.")
+            return
+
+        csv_path = os.path.join(
+            self.data_dir_path,
+            f"{self.dataset_name}_{date_str.replace('-','')}.csv",
+        )
+
+        # sink 先寫到暫存檔再改名，中斷時不會留下不完整的檔案
+        csv_path = sink.write(df, csv_path)
+        print(f"Saved: {csv_path}.")
+
+    def save_history_data(self, start_date_str, end_date_str, workers=4, rps=2):
         start_date = datetime.strptime(start_date_str, "%Y-%m-%d")
         end_date = datetime.strptime(end_date_str, "%Y-%m-%d")
 
+        # 這次補資料的所有執行緒(含組合資料集的子API)共用，每秒最多 rps 個請求
+        rate_limiter = fetch.RateLimiter(rps)
+
+        date_strs = []
+
         while start_date <= end_date:
-            date_str = start_date.strftime("%Y-%m-%d")
+            date_strs.append(start_date.strftime("%Y-%m-%d"))
+            start_date += timedelta(days=1)
 
-            json_data = self.get_json(date_str)
-            # self.save_json(json_data)
+        # 跳過上次已完成的日期
+        done = self.get_ledger()
+        pending = [date_str for date_str in date_strs if date_str not in done]
 
-            df = self.json_to_df(json_data)
+        print(
+            f"Days: {len(date_strs)}, done: {len(date_strs) - len(pending)}, "
+            f"pending: {len(pending)}"
+        )
 
-            if not df.empty:
-                os.makedirs(self.data_dir_path, exist_ok=True)
+        os.makedirs(self.data_dir_path, exist_ok=True)
+        failed = []
 
-                csv_path = os.path.join(
-                    self.data_dir_path,
-                    f"{self.dataset_name}_{date_str.replace('-','')}.csv",
-                )
+        with ThreadPoolExecutor(workers) as pool:
+            futures = {
+                pool.submit(self.save_day_data, date_str, rate_limiter): date_str
+                for date_str in pending
+            }
+
+            for future in as_completed(futures):
+                date_str = futures[future]
+
+                try:
+                    future.result()
+
+                except Exception as e:
+                    print(f"Failed: {date_str}: {e!r}")
+                    failed.append(date_str)
+                    continue
 
-                df.to_csv(csv_path, index=False)
-                print(f"Saved: {csv_path}.")
+                # 只在主執行緒寫入，不需要鎖
+                with open(self.get_ledger_path(), "a") as f:
+                    f.write(f"{date_str}\n")
 
+        if failed:
+            raise RuntimeError(f"{len(failed)} day(s) failed: {sorted(failed)}")
+
+    def build_metadata(self, kind, records):
+        metadata = {}
+
+        for record in records:
+            if kind == "stations":
+                key, name, location = record["id"], record["name"], record["location"]
+
+            # region_metadata, area_metadata
             else:
-                print(f"Data for is empty.")
+                key = name = record["name"]
+                location = record["label_location"]
+
+            metadata[key] = [
+                name,
+                location["longitude"],
+                location["latitude"],
+                f"POINT({location['longitude']} {location['latitude']})",
+            ]
 
-            start_date += timedelta(days=1)
+        return metadata
+
+    def get_metadata(self, kind, records):
+        import pandas as pd
+
+        # 測站很少變動，清單和上次相同時直接用快取(含算好的WKT)
+        key = f"{self.api_name}_{kind}"
+
+        with self.metadata_lock:
+            cached = self.metadata_cache.get(key)
+
+            if cached and cached[0] == records:
+                return cached[1]
+
+            records_hash = hashlib.sha1(
+                json.dumps(records, sort_keys=True).encode()
+            ).hexdigest()
+
+            metadata_path = os.path.join("data/", "metadata", f"{key}.json")
+            metadata = None
+
+            if os.path.exists(metadata_path):
+                with open(metadata_path) as f:
+                    saved = json.load(f)
+
+                if saved["hash"] == records_hash:
+                    metadata = saved["metadata"]
+
+            if metadata is None:
+                metadata = self.build_metadata(kind, records)
+
+                os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+
+                with open(f"{metadata_path}.part", "w") as f:
+                    json.dump({"hash": records_hash, "metadata": metadata}, f)
+
+                os.replace(f"{metadata_path}.part", metadata_path)
+                print(f"Saved: {metadata_path}.")
+
+            df = pd.DataFrame.from_dict(
+                metadata,
+                orient="index",
+                columns=["name", "longitude", "latitude", "WKT"],
+                dtype=object,
+            )
+
+            self.metadata_cache[key] = (copy.deepcopy(records), df)
+
+            return df
+
+    def join_metadata(self, df, key_column, metadata, column_map):
+        # 一次查出所有列的metadata，不逐列查dict、組WKT字串
+        df[list(column_map.values())] = metadata.loc[
+            df[key_column], list(column_map)
+        ].to_numpy()
+
+        return df
+
+    def like_loc_append(self, df):
+        # 舊版逐列 df.loc[len(df)] = row，pandas 依序推斷型別：開頭連續的數值只要有小數，
+        # 整數也變成小數(26 -> 26.0)，整欄都是數值時為數值欄位。照同樣規則轉換，CSV才和舊版相同
+        import pandas as pd
+
+        columns = {}
+
+        for column in df.columns:
+            values = df[column].tolist()
+            end = next(
+                (
+                    i
+                    for i, value in enumerate(values)
+                    if not isinstance(value, (int, float))
+                ),
+                len(values),
+            )
+
+            has_float = any(isinstance(value, float) for value in values[:end])
+            numbers = [float(v) if has_float else int(v) for v in values[:end]]
+
+            if numbers and end == len(values):
+                dtype = "float64" if has_float else "int64"
+                columns[column] = pd.Series(numbers, index=df.index, dtype=dtype)
+
+            else:
+                columns[column] = pd.Series(
+                    numbers + values[end:], index=df.index, dtype=object
+                )
+
+        return pd.DataFrame(columns, index=df.index)
 
     def process_datetime(self, datetime_str):
         return datetime_str.replace("T", " ").replace("+08:00", "")
@@ -118,6 +353,8 @@ class SGEnviron24HourWeatherForecast(SGEnviron):
         self.api_name = "24-hour-weather-forecast"
 
     def json_to_df(self, json_data):
+        import pandas as pd
+
         columns = [
             # "Update Timestamp",
             "Report Time",
@@ -140,33 +377,35 @@ class SGEnviron24HourWeatherForecast(SGEnviron):
             "Wind Direction (General)",
         ]
 
-        df = pd.DataFrame(columns=columns)
+        rows = []
 
         for item in json_data["items"]:
             for period in item["periods"]:
-                df.loc[len(df)] = [
-                    # item["update_timestamp"],
-                    self.process_datetime(item["timestamp"]),
-                    # item["valid_period"]["start"],
-                    # item["valid_period"]["end"],
-                    self.process_datetime(period["time"]["start"]),
-                    self.process_datetime(period["time"]["end"]),
-                    period["regions"]["west"],
-                    period["regions"]["east"],
-                    period["regions"]["central"],
-                    period["regions"]["south"],
-                    period["regions"]["north"],
-                    item["general"]["forecast"],
-                    item["general"]["relative_humidity"]["low"],
-                    item["general"]["relative_humidity"]["high"],
-                    item["general"]["temperature"]["low"],
-                    item["general"]["temperature"]["high"],
-                    item["general"]["wind"]["speed"]["low"],
-                    item["general"]["wind"]["speed"]["high"],
-                    item["general"]["wind"]["direction"],
-                ]
+                rows.append(
+                    [
+                        # item["update_timestamp"],
+                        self.process_datetime(item["timestamp"]),
+                        # item["valid_period"]["start"],
+                        # item["valid_period"]["end"],
+                        self.process_datetime(period["time"]["start"]),
+                        self.process_datetime(period["time"]["end"]),
+                        period["regions"]["west"],
+                        period["regions"]["east"],
+                        period["regions"]["central"],
+                        period["regions"]["south"],
+                        period["regions"]["north"],
+                        item["general"]["forecast"],
+                        item["general"]["relative_humidity"]["low"],
+                        item["general"]["relative_humidity"]["high"],
+                        item["general"]["temperature"]["low"],
+                        item["general"]["temperature"]["high"],
+                        item["general"]["wind"]["speed"]["low"],
+                        item["general"]["wind"]["speed"]["high"],
+                        item["general"]["wind"]["direction"],
+                    ]
+                )
 
-        return df
+        return self.like_loc_append(pd.DataFrame(rows, columns=columns, dtype=object))
 
 
 class SGEnviron2HourWeatherForecast(SGEnviron):
@@ -175,6 +414,8 @@ class SGEnviron2HourWeatherForecast(SGEnviron):
         self.api_name = "2-hour-weather-forecast"
 
     def json_to_df(self, json_data):
+        import pandas as pd
+
         columns = [
             # "Update Timestamp",
             "Report Time",
@@ -187,27 +428,37 @@ class SGEnviron2HourWeatherForecast(SGEnviron):
             "WKT",
         ]
 
-        df = pd.DataFrame(columns=columns)
+        rows = []
 
-        area_metadata = {
-            i["name"]: i["label_location"] for i in json_data["area_metadata"]
-        }
+        area_metadata = self.get_metadata("area_metadata", json_data["area_metadata"])
 
         for item in json_data["items"]:
+            report_time = self.process_datetime(item["timestamp"])
+            start_time = self.process_datetime(item["valid_period"]["start"])
+            end_time = self.process_datetime(item["valid_period"]["end"])
+
             for forecast in item["forecasts"]:
-                df.loc[len(df)] = [
-                    # item["update_timestamp"],
-                    self.process_datetime(item["timestamp"]),
-                    self.process_datetime(item["valid_period"]["start"]),
-                    self.process_datetime(item["valid_period"]["end"]),
-                    forecast["area"],
-                    forecast["forecast"],
-                    area_metadata[forecast["area"]]["longitude"],
-                    area_metadata[forecast["area"]]["latitude"],
-                    f"POINT({area_metadata[forecast['area']]['longitude']} {area_metadata[forecast['area']]['latitude']})",
-                ]
+                rows.append(
+                    [
+                        # item["update_timestamp"],
+                        report_time,
+                        start_time,
+                        end_time,
+                        forecast["area"],
+                        forecast["forecast"],
+                    ]
+                )
 
-        return df
+        df = pd.DataFrame(rows, columns=columns[:5], dtype=object)
+
+        df = self.join_metadata(
+            df,
+            "Area",
+            area_metadata,
+            {"longitude": "Longitude", "latitude": "Latitude", "WKT": "WKT"},
+        )
+
+        return self.like_loc_append(df)
 
 
 class SGEnviron4DayWeatherForecast(SGEnviron):
@@ -216,6 +467,8 @@ class SGEnviron4DayWeatherForecast(SGEnviron):
         self.api_name = "4-day-weather-forecast"
 
     def json_to_df(self, json_data):
+        import pandas as pd
+
         columns = [
             # "Update Timestamp",
             "Report Time",
@@ -231,26 +484,28 @@ class SGEnviron4DayWeatherForecast(SGEnviron):
             "Wind Direction",
         ]
 
-        df = pd.DataFrame(columns=columns)
+        rows = []
 
         for item in json_data["items"]:
             for forecast in item["forecasts"]:
-                df.loc[len(df)] = [
-                    # item["update_timestamp"],
-                    self.process_datetime(item["timestamp"]),
-                    # forecast["timestamp"],
-                    forecast["date"],
-                    forecast["forecast"],
-                    forecast["temperature"]["low"],
-                    forecast["temperature"]["high"],
-                    forecast["relative_humidity"]["low"],
-                    forecast["relative_humidity"]["high"],
-                    forecast["wind"]["speed"]["low"],
-                    forecast["wind"]["speed"]["high"],
-                    forecast["wind"]["direction"],
-                ]
+                rows.append(
+                    [
+                        # item["update_timestamp"],
+                        self.process_datetime(item["timestamp"]),
+                        # forecast["timestamp"],
+                        forecast["date"],
+                        forecast["forecast"],
+                        forecast["temperature"]["low"],
+                        forecast["temperature"]["high"],
+                        forecast["relative_humidity"]["low"],
+                        forecast["relative_humidity"]["high"],
+                        forecast["wind"]["speed"]["low"],
+                        forecast["wind"]["speed"]["high"],
+                        forecast["wind"]["direction"],
+                    ]
+                )
 
-        return df
+        return self.like_loc_append(pd.DataFrame(rows, columns=columns, dtype=object))
 
 
 class SGEnvironAirTemperature(SGEnviron):
@@ -258,8 +513,8 @@ class SGEnvironAirTemperature(SGEnviron):
         self.dataset_name = "air-temperature-across-singapore"
         self.api_name = "air-temperature"
 
-    def get_json(self, date_str=None):
-        json_data = super().get_json(date_str)
+    def get_json(self, date_str=None, force=False, rate_limiter=None):
+        json_data = super().get_json(date_str, force, rate_limiter)
 
         # 歷史資料只保留整點和30分的資料
         if date_str:
@@ -272,6 +527,8 @@ class SGEnvironAirTemperature(SGEnviron):
         return json_data
 
     def json_to_df(self, json_data):
+        import pandas as pd
+
         columns = [
             "Time",
             "Station Name",
@@ -281,29 +538,33 @@ class SGEnvironAirTemperature(SGEnviron):
             "WKT",
         ]
 
-        df = pd.DataFrame(columns=columns)
+        rows = []
 
-        station_dict = {}
-
-        for station in json_data["metadata"]["stations"]:
-            station_dict[station["id"]] = {
-                "name": station["name"],
-                "longitude": station["location"]["longitude"],
-                "latitude": station["location"]["latitude"],
-            }
+        stations = self.get_metadata("stations", json_data["metadata"]["stations"])
 
         for item in json_data["items"]:
+            time_str = self.process_datetime(item["timestamp"])
+
             for reading in item["readings"]:
-                df.loc[len(df)] = [
-                    self.process_datetime(item["timestamp"]),
-                    station_dict[reading["station_id"]]["name"],
-                    reading.get("value"),
-                    station_dict[reading["station_id"]]["longitude"],
-                    station_dict[reading["station_id"]]["latitude"],
-                    f"POINT({station_dict[reading['station_id']]['longitude']} {station_dict[reading['station_id']]['latitude']})",
-                ]
+                rows.append([time_str, reading["station_id"], reading.get("value")])
 
-        return df
+        df = pd.DataFrame(
+            rows, columns=["Time", "Station ID", "Temperature"], dtype=object
+        )
+
+        df = self.join_metadata(
+            df,
+            "Station ID",
+            stations,
+            {
+                "name": "Station Name",
+                "longitude": "Station Longitude",
+                "latitude": "Station Latitude",
+                "WKT": "WKT",
+            },
+        )
+
+        return self.like_loc_append(df[columns])
 
 
 class SGEnvironPM25(SGEnviron):
@@ -312,6 +573,8 @@ class SGEnvironPM25(SGEnviron):
         self.api_name = "pm25"
 
     def json_to_df(self, json_data):
+        import pandas as pd
+
         columns = [
             "Time",
             "Region",
@@ -321,26 +584,26 @@ class SGEnvironPM25(SGEnviron):
             "WKT",
         ]
 
-        df = pd.DataFrame(columns=columns)
+        rows = []
 
-        region_dict = {
-            region["name"]: region["label_location"]
-            for region in json_data["region_metadata"]
-        }
+        regions = self.get_metadata("region_metadata", json_data["region_metadata"])
 
         for item in json_data["items"]:
+            time_str = self.process_datetime(item["timestamp"])
+
             for region, pm25 in item["readings"]["pm25_one_hourly"].items():
-                df.loc[len(df)] = [
-                    # item["update_timestamp"],
-                    self.process_datetime(item["timestamp"]),
-                    region,
-                    pm25,
-                    region_dict[region]["longitude"],
-                    region_dict[region]["latitude"],
-                    f"POINT({region_dict[region]['longitude']} {region_dict[region]['latitude']})",
-                ]
+                rows.append([time_str, region, pm25])
 
-        return df
+        df = pd.DataFrame(rows, columns=columns[:3], dtype=object)
+
+        df = self.join_metadata(
+            df,
+            "Region",
+            regions,
+            {"longitude": "Longitude", "latitude": "Latitude", "WKT": "WKT"},
+        )
+
+        return self.like_loc_append(df)
 
 
 class SGEnvironPSI(SGEnviron):
@@ -349,6 +612,8 @@ class SGEnvironPSI(SGEnviron):
         self.api_name = "psi"
 
     def json_to_df(self, json_data):
+        import pandas as pd
+
         columns = [
             # "Update Time",
             "Time",
@@ -370,37 +635,42 @@ class SGEnvironPSI(SGEnviron):
             "WKT",
         ]
 
-        df = pd.DataFrame(columns=columns)
+        rows = []
 
-        region_dict = {
-            region["name"]: region["label_location"]
-            for region in json_data["region_metadata"]
-        }
+        regions = self.get_metadata("region_metadata", json_data["region_metadata"])
 
         for item in json_data["items"]:
-            for region in region_dict.keys():
-                df.loc[len(df)] = [
-                    # item["update_timestamp"],
-                    self.process_datetime(item["timestamp"]),
-                    region,
-                    item["readings"].get("psi_twenty_four_hourly", {}).get(region),
-                    item["readings"].get("pm25_twenty_four_hourly", {}).get(region),
-                    item["readings"].get("pm25_sub_index", {}).get(region),
-                    item["readings"].get("pm10_twenty_four_hourly", {}).get(region),
-                    item["readings"].get("pm10_sub_index", {}).get(region),
-                    item["readings"].get("co_eight_hour_max", {}).get(region),
-                    item["readings"].get("co_sub_index", {}).get(region),
-                    item["readings"].get("o3_eight_hour_max", {}).get(region),
-                    item["readings"].get("o3_sub_index", {}).get(region),
-                    item["readings"].get("so2_twenty_four_hourly", {}).get(region),
-                    item["readings"].get("so2_sub_index", {}).get(region),
-                    item["readings"].get("no2_one_hour_max", {}).get(region),
-                    region_dict[region]["longitude"],
-                    region_dict[region]["latitude"],
-                    f"POINT({region_dict[region]['longitude']} {region_dict[region]['latitude']})",
-                ]
+            for region in regions.index:
+                rows.append(
+                    [
+                        # item["update_timestamp"],
+                        self.process_datetime(item["timestamp"]),
+                        region,
+                        item["readings"].get("psi_twenty_four_hourly", {}).get(region),
+                        item["readings"].get("pm25_twenty_four_hourly", {}).get(region),
+                        item["readings"].get("pm25_sub_index", {}).get(region),
+                        item["readings"].get("pm10_twenty_four_hourly", {}).get(region),
+                        item["readings"].get("pm10_sub_index", {}).get(region),
+                        item["readings"].get("co_eight_hour_max", {}).get(region),
+                        item["readings"].get("co_sub_index", {}).get(region),
+                        item["readings"].get("o3_eight_hour_max", {}).get(region),
+                        item["readings"].get("o3_sub_index", {}).get(region),
+                        item["readings"].get("so2_twenty_four_hourly", {}).get(region),
+                        item["readings"].get("so2_sub_index", {}).get(region),
+                        item["readings"].get("no2_one_hour_max", {}).get(region),
+                    ]
+                )
 
-        return df
+        df = pd.DataFrame(rows, columns=columns[:-3], dtype=object)
+
+        df = self.join_metadata(
+            df,
+            "Region",
+            regions,
+            {"longitude": "Longitude", "latitude": "Latitude", "WKT": "WKT"},
+        )
+
+        return self.like_loc_append(df)
 
 
 class SGEnvironRainfall(SGEnvironAirTemperature):
@@ -453,22 +723,26 @@ class SGEnvironUltraVioletIndex(SGEnviron):
         self.api_name = "uv-index"
 
     def json_to_df(self, json_data):
+        import pandas as pd
+
         columns = [
             "Time",
             "UVI",
         ]
 
-        df = pd.DataFrame(columns=columns)
+        rows = []
 
         for item in json_data["items"]:
             index = item["index"][0]
 
-            df.loc[len(df)] = [
-                self.process_datetime(index["timestamp"]),
-                index["value"],
-            ]
+            rows.append(
+                [
+                    self.process_datetime(index["timestamp"]),
+                    index["value"],
+                ]
+            )
 
-        return df
+        return self.like_loc_append(pd.DataFrame(rows, columns=columns, dtype=object))
 
 
 class SGEnvironAQI(SGEnviron):
@@ -478,14 +752,19 @@ class SGEnvironAQI(SGEnviron):
 
         self.sg_environ_pm25 = SGEnvironPM25()
         self.sg_environ_psi = SGEnvironPSI()
+        self.sg_environs = [self.sg_environ_pm25, self.sg_environ_psi]
 
-    def get_json(self, date_str=None):
-        json_pm25 = self.sg_environ_pm25.get_json(date_str)
-        json_psi = self.sg_environ_psi.get_json(date_str)
+    def get_json(self, date_str=None, rate_limiter=None):
+        # (json_pm25, json_psi)
+        return self.get_json_group(self.sg_environs, date_str, rate_limiter)
 
-        return json_pm25, json_psi
+    def commit(self):
+        for sg_environ in self.sg_environs:
+            sg_environ.commit()
 
     def json_to_df(self, json_data_tuple):
+        import pandas as pd
+
         columns = [
             "Time",
             "Region",
@@ -531,6 +810,10 @@ class SGEnvironAQI(SGEnviron):
 
         json_data_tuple = self.get_json()
 
+        if json_data_tuple is None:
+            print("Not modified, skip.")
+            return
+
         df = self.json_to_df(json_data_tuple)
 
         if not df.empty:
@@ -540,9 +823,11 @@ class SGEnvironAQI(SGEnviron):
 
             csv_path = os.path.join(self.data_dir_path, csv_name)
 
-            df.to_csv(csv_path, index=False)
+            csv_path = sink.write(df, csv_path)
             print(f"Saved: {csv_path}.")
 
+        self.commit()
+
 
 class SGEnvironWind(SGEnviron):
     def __init__(self):
@@ -553,21 +838,25 @@ class SGEnvironWind(SGEnviron):
         self.sg_environ_relative_humidity = SGEnvironRelativeHumidity()
         self.sg_environ_wind_direction = SGEnvironWindDirection()
         self.sg_environ_wind_speed = SGEnvironWindSpeed()
+        self.sg_environs = [
+            self.sg_environ_air_temperature,
+            self.sg_environ_relative_humidity,
+            self.sg_environ_wind_direction,
+            self.sg_environ_wind_speed,
+        ]
 
-    def get_json(self, date_str=None):
-        json_air_temperature = self.sg_environ_air_temperature.get_json(date_str)
-        json_relative_humidity = self.sg_environ_relative_humidity.get_json(date_str)
-        json_wind_direction = self.sg_environ_wind_direction.get_json(date_str)
-        json_wind_speed = self.sg_environ_wind_speed.get_json(date_str)
-
-        return (
-            json_air_temperature,
-            json_relative_humidity,
-            json_wind_direction,
-            json_wind_speed,
-        )
+    def get_json(self, date_str=None, rate_limiter=None):
+        # (json_air_temperature, json_relative_humidity,
+        #  json_wind_direction, json_wind_speed)
+        return self.get_json_group(self.sg_environs, date_str, rate_limiter)
+
+    def commit(self):
+        for sg_environ in self.sg_environs:
+            sg_environ.commit()
 
     def json_to_df(self, json_data_tuple):
+        import pandas as pd
+
         columns = [
             "Time",
             "Station Name",
@@ -633,6 +922,10 @@ class SGEnvironWind(SGEnviron):
 
         json_data_tuple = self.get_json()
 
+        if json_data_tuple is None:
+            print("Not modified, skip.")
+            return
+
         df = self.json_to_df(json_data_tuple)
 
         if not df.empty:
@@ -642,9 +935,11 @@ class SGEnvironWind(SGEnviron):
 
             csv_path = os.path.join(self.data_dir_path, csv_name)
 
-            df.to_csv(csv_path, index=False)
+            csv_path = sink.write(df, csv_path)
             print(f"Saved: {csv_path}.")
 
+        self.commit()
+
 
 if __name__ == "__main__":
     try:
@@ -669,7 +964,7 @@ if __name__ == "__main__":
         sg_environ = SGEnvironWind()
 
         # # 儲存歷史資料
-        # sg_environ.save_history_data("2024-12-09", "2024-12-11")
+        # sg_environ.save_history_data("2024-12-09", "2024-12-11", workers=4, rps=2)
 
         # 儲存即時資料
         sg_environ.save_data()
@@ -0,0 +1,308 @@
+import argparse
+import json
+import os
+import time
+import pandas as pd
+
+from SG_environ import (
+    SGEnviron24HourWeatherForecast,
+    SGEnviron2HourWeatherForecast,
+    SGEnviron4DayWeatherForecast,
+    SGEnvironAirTemperature,
+    SGEnvironPM25,
+    SGEnvironPSI,
+    SGEnvironRainfall,
+    SGEnvironRelativeHumidity,
+    SGEnvironWindDirection,
+    SGEnvironWindSpeed,
+    SGEnvironUltraVioletIndex,
+)
+
+fixture_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+
+# 舊版做法：每一列都用 df.loc[len(df)] 加到DataFrame
+def json_to_df_24_hour(sg_environ, json_data):
+    columns = [
+        "Report Time",
+        "Target Start Time",
+        "Target End Time",
+        "Weather Forecast (West)",
+        "Weather Forecast (East)",
+        "Weather Forecast (Central)",
+        "Weather Forecast (South)",
+        "Weather Forecast (North)",
+        "Weather Forecast (General)",
+        "Relative Humidity Low (General)",
+        "Relative Humidity High (General)",
+        "Temperature Low (General)",
+        "Temperature High (General)",
+        "Wind Speed Low (General)",
+        "Wind Speed High (General)",
+        "Wind Direction (General)",
+    ]
+
+    df = pd.DataFrame(columns=columns)
+
+    for item in json_data["items"]:
+        for period in item["periods"]:
+            df.loc[len(df)] = [
+                sg_environ.process_datetime(item["timestamp"]),
+                sg_environ.process_datetime(period["time"]["start"]),
+                sg_environ.process_datetime(period["time"]["end"]),
+                period["regions"]["west"],
+                period["regions"]["east"],
+                period["regions"]["central"],
+                period["regions"]["south"],
+                period["regions"]["north"],
+                item["general"]["forecast"],
+                item["general"]["relative_humidity"]["low"],
+                item["general"]["relative_humidity"]["high"],
+                item["general"]["temperature"]["low"],
+                item["general"]["temperature"]["high"],
+                item["general"]["wind"]["speed"]["low"],
+                item["general"]["wind"]["speed"]["high"],
+                item["general"]["wind"]["direction"],
+            ]
+
+    return df
+
+
+def json_to_df_2_hour(sg_environ, json_data):
+    columns = [
+        "Report Time",
+        "Target Start Time",
+        "Target End Time",
+        "Area",
+        "Forecast",
+        "Longitude",
+        "Latitude",
+        "WKT",
+    ]
+
+    df = pd.DataFrame(columns=columns)
+
+    area_metadata = {i["name"]: i["label_location"] for i in json_data["area_metadata"]}
+
+    for item in json_data["items"]:
+        for forecast in item["forecasts"]:
+            location = area_metadata[forecast["area"]]
+
+            df.loc[len(df)] = [
+                sg_environ.process_datetime(item["timestamp"]),
+                sg_environ.process_datetime(item["valid_period"]["start"]),
+                sg_environ.process_datetime(item["valid_period"]["end"]),
+                forecast["area"],
+                forecast["forecast"],
+                location["longitude"],
+                location["latitude"],
+                f"POINT({location['longitude']} {location['latitude']})",
+            ]
+
+    return df
+
+
+def json_to_df_4_day(sg_environ, json_data):
+    columns = [
+        "Report Time",
+        "Target Date",
+        "Forecast",
+        "Temperature Low",
+        "Temperature High",
+        "Relative Humidity Low",
+        "Relative Humidity High",
+        "Wind Speed Low",
+        "Wind Speed High",
+        "Wind Direction",
+    ]
+
+    df = pd.DataFrame(columns=columns)
+
+    for item in json_data["items"]:
+        for forecast in item["forecasts"]:
+            df.loc[len(df)] = [
+                sg_environ.process_datetime(item["timestamp"]),
+                forecast["date"],
+                forecast["forecast"],
+                forecast["temperature"]["low"],
+                forecast["temperature"]["high"],
+                forecast["relative_humidity"]["low"],
+                forecast["relative_humidity"]["high"],
+                forecast["wind"]["speed"]["low"],
+                forecast["wind"]["speed"]["high"],
+                forecast["wind"]["direction"],
+            ]
+
+    return df
+
+
+def json_to_df_station(sg_environ, json_data, value_column="Temperature"):
+    columns = [
+        "Time",
+        "Station Name",
+        value_column,
+        "Station Longitude",
+        "Station Latitude",
+        "WKT",
+    ]
+
+    df = pd.DataFrame(columns=columns)
+
+    station_dict = {}
+
+    for station in json_data["metadata"]["stations"]:
+        station_dict[station["id"]] = {
+            "name": station["name"],
+            "longitude": station["location"]["longitude"],
+            "latitude": station["location"]["latitude"],
+        }
+
+    for item in json_data["items"]:
+        for reading in item["readings"]:
+            station = station_dict[reading["station_id"]]
+
+            df.loc[len(df)] = [
+                sg_environ.process_datetime(item["timestamp"]),
+                station["name"],
+                reading.get("value"),
+                station["longitude"],
+                station["latitude"],
+                f"POINT({station['longitude']} {station['latitude']})",
+            ]
+
+    return df
+
+
+def json_to_df_pm25(sg_environ, json_data):
+    columns = ["Time", "Region", "PM2.5", "Longitude", "Latitude", "WKT"]
+
+    df = pd.DataFrame(columns=columns)
+
+    region_dict = {
+        region["name"]: region["label_location"]
+        for region in json_data["region_metadata"]
+    }
+
+    for item in json_data["items"]:
+        for region, pm25 in item["readings"]["pm25_one_hourly"].items():
+            location = region_dict[region]
+
+            df.loc[len(df)] = [
+                sg_environ.process_datetime(item["timestamp"]),
+                region,
+                pm25,
+                location["longitude"],
+                location["latitude"],
+                f"POINT({location['longitude']} {location['latitude']})",
+            ]
+
+    return df
+
+
+def json_to_df_psi(sg_environ, json_data):
+    readings = [
+        ("PSI (24 hourly)", "psi_twenty_four_hourly"),
+        ("PM2.5 (24 hourly)", "pm25_twenty_four_hourly"),
+        ("PM2.5 (subindex)", "pm25_sub_index"),
+        ("PM10 (24 hourly)", "pm10_twenty_four_hourly"),
+        ("PM10 (subindex)", "pm10_sub_index"),
+        ("CO (8 hour max)", "co_eight_hour_max"),
+        ("CO (subindex)", "co_sub_index"),
+        ("O3 (8 hour max)", "o3_eight_hour_max"),
+        ("O3 (subindex)", "o3_sub_index"),
+        ("SO2 (24 hourly)", "so2_twenty_four_hourly"),
+        ("SO2 (subindex)", "so2_sub_index"),
+        ("NO2 (1 hour max)", "no2_one_hour_max"),
+    ]
+    columns = (
+        ["Time", "Region"]
+        + [column for column, _ in readings]
+        + ["Longitude", "Latitude", "WKT"]
+    )
+
+    df = pd.DataFrame(columns=columns)
+
+    region_dict = {
+        region["name"]: region["label_location"]
+        for region in json_data["region_metadata"]
+    }
+
+    for item in json_data["items"]:
+        for region, location in region_dict.items():
+            df.loc[len(df)] = (
+                [sg_environ.process_datetime(item["timestamp"]), region]
+                + [item["readings"].get(key, {}).get(region) for _, key in readings]
+                + [
+                    location["longitude"],
+                    location["latitude"],
+                    f"POINT({location['longitude']} {location['latitude']})",
+                ]
+            )
+
+    return df
+
+
+def json_to_df_uv(sg_environ, json_data):
+    df = pd.DataFrame(columns=["Time", "UVI"])
+
+    for item in json_data["items"]:
+        index = item["index"][0]
+
+        df.loc[len(df)] = [
+            sg_environ.process_datetime(index["timestamp"]),
+            index["value"],
+        ]
+
+    return df
+
+
+def benchmark(payload_dir):
+    for sg_environ, json_to_df_old in [
+        (SGEnviron24HourWeatherForecast(), json_to_df_24_hour),
+        (SGEnviron2HourWeatherForecast(), json_to_df_2_hour),
+        (SGEnviron4DayWeatherForecast(), json_to_df_4_day),
+        (SGEnvironAirTemperature(), json_to_df_station),
+        (SGEnvironPM25(), json_to_df_pm25),
+        (SGEnvironPSI(), json_to_df_psi),
+        (SGEnvironRainfall(), json_to_df_station),
+        (SGEnvironRelativeHumidity(), json_to_df_station),
+        (SGEnvironWindDirection(), json_to_df_station),
+        (SGEnvironWindSpeed(), json_to_df_station),
+        (SGEnvironUltraVioletIndex(), json_to_df_uv),
+    ]:
+        # 錄製的一整天API回應：<api_name>.json（get_json(date_str)的結果）
+        json_path = os.path.join(payload_dir, f"{sg_environ.api_name}.json")
+
+        if not os.path.exists(json_path):
+            print(f"Skip: {json_path}")
+            continue
+
+        with open(json_path) as f:
+            json_data = json.load(f)
+
+        start = time.perf_counter()
+        df = sg_environ.json_to_df(json_data)
+        new = time.perf_counter() - start
+
+        start = time.perf_counter()
+        df_old = json_to_df_old(sg_environ, json_data)
+        old = time.perf_counter() - start
+
+        # 測站類的數值欄位名稱不同
+        df_old.columns = df.columns
+
+        # 輸出的CSV要完全相同(例如 26.0 不能變成 26)
+        assert df_old.to_csv(index=False) == df.to_csv(index=False), json_path
+
+        print(
+            f"{sg_environ.api_name}: {len(df)} rows, "
+            f"{old:.3f}s -> {new:.3f}s ({old / new:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("payload_dir", nargs="?", default=fixture_dir)
+    args = parser.parse_args()
+
+    benchmark(args.payload_dir)
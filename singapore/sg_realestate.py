@@ -1,45 +1,290 @@
-import requests
-import pandas as pd
+import os
+import re
+import sys
+import json
 from datetime import datetime
+from itertools import chain
+from concurrent.futures import ThreadPoolExecutor
 
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
 
-data_dir = "."
 
+data_dir = "."
 
-def get_df(dataset_id):
+# 各資料集共用的欄位型別 (轉換後的欄位名稱)
+schema = {
+    "Month": "month",
+    "Rent Approval Date": "month",
+    "Town": "category",
+    "Flat Type": "category",
+    "Street Name": "category",
+    "Storey Range": "category",
+    "Flat Model": "category",
+    "Room Type": "category",
+    "Financial Year": "category",
+    "Building Contract Town": "category",
+    "Residential": "category",
+    "Commercial": "category",
+    "Market Hawker": "category",
+    "Miscellaneous": "category",
+    "Multistorey Carpark": "category",
+    "Precinct Pavilion": "category",
+    "Floor Area": "number",
+    "Resale Price": "number",
+    "Monthly Rent": "number",
+    "Min Selling Price": "number",
+    "Max Selling Price": "number",
+    "Min Selling Price Less Ahg Shg": "number",
+    "Max Selling Price Less Ahg Shg": "number",
+    "Lease Commence Date": "int32",
+    "Remaining Lease Years": "int32",
+    "Remaining Lease Months": "int32",
+    "Max Floor Level": "int32",
+    "Year Completed": "int32",
+    "Total Dwelling Units": "int32",
+    "1room Sold": "int32",
+    "2room Sold": "int32",
+    "3room Sold": "int32",
+    "4room Sold": "int32",
+    "5room Sold": "int32",
+    "Exec Sold": "int32",
+    "Multigen Sold": "int32",
+    "Studio Apartment Sold": "int32",
+    "1room Rental": "int32",
+    "2room Rental": "int32",
+    "3room Rental": "int32",
+    "Other Room Rental": "int32",
+}
+
+
+def get_records(dataset_id, offset, limit):
     base_url = "https://data.gov.sg/api/action/datastore_search"
+
+    # 依 _id 排序，offset 才會對應到固定的資料，也才能從上次同步的位置接著抓
+    url = (
+        f"{base_url}?resource_id={dataset_id}&limit={limit}&offset={offset}"
+        "&sort=_id%20asc"
+    )
+    print("URL:", url)
+    response = fetch.get(url)
+    data = response.json()
+
+    records = data["result"]["records"]
+
+    # 建DataFrame前就拿掉 _id，不用再 drop 複製一次
+    for record in records:
+        record.pop("_id", None)
+
+    return data["result"]["total"], records
+
+
+def get_all_records(dataset_id, start=0, workers=4):
     limit = 5000
-    offset = 0
-    all_records = []
 
-    while True:
-        url = f"{base_url}?resource_id={dataset_id}&limit={limit}&offset={offset}"
-        print("URL:", url)
-        response = requests.get(url)
-        data = response.json()
+    # 第一頁會回傳總筆數，其餘的 offset 一次算好後同時抓
+    total, records = get_records(dataset_id, start, limit)
+
+    with ThreadPoolExecutor(workers) as pool:
+        pages = pool.map(
+            lambda offset: get_records(dataset_id, offset, limit)[1],
+            range(start + limit, total, limit),
+        )
+
+        all_records = list(chain(records, *pages))
 
-        records = data["result"]["records"]
-        if not records:
-            break
+    return total, all_records
 
-        all_records.extend(records)
-        offset += limit
+
+def get_df(dataset_id, workers=4):
+    import pandas as pd
+
+    total, all_records = get_all_records(dataset_id, workers=workers)
 
     df = pd.DataFrame(all_records)
-    df = df.drop(columns=["_id"])
 
     return df
 
 
-def save_df(df, dataset_name):
-    today = datetime.today().strftime("%Y%m%d")
-    csv_path = f"{data_dir}/{dataset_name}_{today}.csv"
-    df.to_csv(csv_path, index=False)
-    print(f"Saved {csv_path}")
+def apply_schema(df, keep_text=False):
+    import pandas as pd
+
+    columns = {}
+
+    for column in df.columns:
+        kind = schema.get(column)
+
+        if kind == "month":
+            # Period 寫出時仍是 "2017-01"，空字串變成 NaT
+            columns[column] = pd.to_datetime(
+                df[column], format="%Y-%m", errors="coerce"
+            ).dt.to_period("M")
+
+        elif kind == "category":
+            columns[column] = df[column].astype("category")
+
+        elif kind == "number":
+            values = pd.to_numeric(df[column], errors="coerce")
+            text = df[column].dropna().astype(str)
+            is_decimal = text[text != ""].str.contains(".", regex=False)
+
+            # 原始值都是整數寫法("300000")時用可為空的 Int32，寫出不會多 ".0"
+            if not is_decimal.any():
+                columns[column] = values.astype("Int32")
+
+            # 整數和小數寫法混在一起("120"、"92.5")時，float64 會把 "120" 寫成
+            # "120.0"，寫 CSV 時保留原始文字
+            elif keep_text and not is_decimal.all():
+                continue
+
+            # 都是小數寫法("250000.0"、"1500888.5")時用 float64，寫出和原始值相同
+            else:
+                columns[column] = values.astype("float64")
+
+        elif kind == "int32":
+            values = pd.to_numeric(df[column], errors="coerce")
+
+            # 有空值(例如舊資料沒有剩餘租約)時用可為空的 Int32
+            columns[column] = values.astype("Int32" if values.hasnans else "int32")
+
+    return df.assign(**columns)
+
+
+def parse_remaining_lease(remaining_lease):
+    import pandas as pd
+
+    # 不重複的值很少(年 x 月)，只解析一次再依代碼展開到每一列
+    codes, uniques = pd.factorize(remaining_lease, use_na_sentinel=False)
+
+    parsed = (
+        pd.Series(uniques, dtype=object)
+        .str.extract(r"(\d+) years(?: (\d+) month)?")
+        .fillna(0)
+        .astype("int32")
+        .to_numpy()
+    )
+
+    return parsed[codes]
+
+
+def get_partition_dir(dataset_name):
+    return os.path.join(data_dir, dataset_name)
+
+
+def get_sync_state_path(dataset_name):
+    return os.path.join(get_partition_dir(dataset_name), "sync_state.json")
+
+
+def get_sync_state(dataset_name):
+    sync_state_path = get_sync_state_path(dataset_name)
+
+    if not os.path.exists(sync_state_path):
+        return {"offset": 0}
+
+    with open(sync_state_path) as f:
+        return json.load(f)
+
+
+def save_sync_state(dataset_name, sync_state):
+    sync_state_path = get_sync_state_path(dataset_name)
+
+    with open(f"{sync_state_path}.part", "w") as f:
+        json.dump(sync_state, f, indent=4)
 
+    os.replace(f"{sync_state_path}.part", sync_state_path)
 
-def resale_flat_prices_1990_to_1999():
-    df = get_df("d_ebc5ab87086db484f88045b47411ebc5")
+
+def clear_partitions(dataset_name):
+    partition_dir = get_partition_dir(dataset_name)
+
+    for file_name in os.listdir(partition_dir):
+        if file_name.endswith(tuple(sink.FORMATS.values())):
+            os.remove(os.path.join(partition_dir, file_name))
+
+
+def get_new_df(dataset_id, dataset_name, workers=4):
+    import pandas as pd
+
+    # 只抓上次同步之後新增的資料 (依 _id 排序的 offset)
+    sync_state = get_sync_state(dataset_name)
+    offset = sync_state["offset"]
+
+    total, records = get_all_records(dataset_id, offset, workers)
+
+    # 資源被整份重新上傳(筆數變少)時，從頭同步
+    if total < offset:
+        print(f"Total {total} < synced {offset}, resync {dataset_name}.")
+        offset = 0
+        total, records = get_all_records(dataset_id, 0, workers)
+
+    os.makedirs(get_partition_dir(dataset_name), exist_ok=True)
+
+    # 從頭同步時清掉舊的分區，避免重複
+    if offset == 0:
+        clear_partitions(dataset_name)
+
+    sync_state = {
+        "resource_id": dataset_id,
+        "offset": offset + len(records),
+        "total": total,
+        "synced_at": datetime.now().isoformat(timespec="seconds"),
+    }
+
+    return pd.DataFrame(records), sync_state
+
+
+def load_df(dataset_id, dataset_name, incremental=False):
+    if incremental:
+        return get_new_df(dataset_id, dataset_name)
+
+    return get_df(dataset_id), None
+
+
+def append_partitions(df, dataset_name, partition_column):
+    import pandas as pd
+
+    partition_dir = get_partition_dir(dataset_name)
+
+    for key, df_partition in df.groupby(
+        partition_column, sort=False, observed=True, dropna=False
+    ):
+        # e.g. Month "2017-01" -> resale_flat_prices_201701.csv
+        key = "" if pd.isna(key) else re.sub(r"\W", "", str(key))
+        file_name = f"{dataset_name}_{key or 'unknown'}.csv"
+        csv_path = os.path.join(partition_dir, file_name)
+
+        csv_path = sink.write(df_partition, csv_path, append=True)
+        print(f"Appended {len(df_partition)} rows: {csv_path}")
+
+
+def save_df(df, dataset_name, sync_state=None, partition_column=None):
+    df = apply_schema(df, keep_text=sink.options["format"] == "csv")
+
+    if sync_state is None:
+        today = datetime.today().strftime("%Y%m%d")
+        csv_path = f"{data_dir}/{dataset_name}_{today}.csv"
+        csv_path = sink.write(df, csv_path)
+        print(f"Saved {csv_path}")
+        return
+
+    # 增量模式：新資料附加到各分區，寫完才記錄同步位置
+    append_partitions(df, dataset_name, partition_column)
+    save_sync_state(dataset_name, sync_state)
+
+
+def resale_flat_prices_1990_to_1999(incremental=False):
+    df, sync_state = load_df(
+        "d_ebc5ab87086db484f88045b47411ebc5",
+        "resale_flat_prices_1990_to_1999",
+        incremental,
+    )
+
+    if df.empty:
+        print("No new records.")
+        return
 
     # Column names 轉成可讀的文字
     df.columns = [
@@ -60,11 +305,19 @@ def resale_flat_prices_1990_to_1999():
     df.insert(10, "Remaining Lease Months", "")
 
     # 存檔
-    save_df(df, "resale_flat_prices_1990_to_1999")
+    save_df(df, "resale_flat_prices_1990_to_1999", sync_state, "Month")
 
 
-def resale_flat_prices_2000_to_201202():
-    df = get_df("d_43f493c6c50d54243cc1eab0df142d6a")
+def resale_flat_prices_2000_to_201202(incremental=False):
+    df, sync_state = load_df(
+        "d_43f493c6c50d54243cc1eab0df142d6a",
+        "resale_flat_prices_2000_to_201202",
+        incremental,
+    )
+
+    if df.empty:
+        print("No new records.")
+        return
 
     # Column names 轉成可讀的文字
     df.columns = [
@@ -85,11 +338,19 @@ def resale_flat_prices_2000_to_201202():
     df.insert(10, "Remaining Lease Months", "")
 
     # 存檔
-    save_df(df, "resale_flat_prices_2000_to_201202")
+    save_df(df, "resale_flat_prices_2000_to_201202", sync_state, "Month")
 
 
-def resale_flat_prices_201202_to_2014():
-    df = get_df("d_2d5ff9ea31397b66239f245f57751537")
+def resale_flat_prices_201202_to_2014(incremental=False):
+    df, sync_state = load_df(
+        "d_2d5ff9ea31397b66239f245f57751537",
+        "resale_flat_prices_201202_to_2014",
+        incremental,
+    )
+
+    if df.empty:
+        print("No new records.")
+        return
 
     # Column names 轉成可讀的文字
     df.columns = [
@@ -110,11 +371,19 @@ def resale_flat_prices_201202_to_2014():
     df.insert(10, "Remaining Lease Months", "")
 
     # 存檔
-    save_df(df, "resale_flat_prices_201202_to_2014")
+    save_df(df, "resale_flat_prices_201202_to_2014", sync_state, "Month")
 
 
-def resale_flat_prices_2015_to_2016():
-    df = get_df("d_ea9ed51da2787afaf8e51f827c304208")
+def resale_flat_prices_2015_to_2016(incremental=False):
+    df, sync_state = load_df(
+        "d_ea9ed51da2787afaf8e51f827c304208",
+        "resale_flat_prices_2015_to_2016",
+        incremental,
+    )
+
+    if df.empty:
+        print("No new records.")
+        return
 
     # Column names 轉成可讀的文字
     df.columns = [
@@ -135,11 +404,17 @@ def resale_flat_prices_2015_to_2016():
     df.insert(10, "Remaining Lease Months", "")
 
     # 存檔
-    save_df(df, "resale_flat_prices_2015_to_2016")
+    save_df(df, "resale_flat_prices_2015_to_2016", sync_state, "Month")
+
 
+def resale_flat_prices(incremental=False):
+    df, sync_state = load_df(
+        "d_8b84c4ee58e3cfc0ece0d773c8ca6abc", "resale_flat_prices", incremental
+    )
 
-def resale_flat_prices():
-    df = get_df("d_8b84c4ee58e3cfc0ece0d773c8ca6abc")
+    if df.empty:
+        print("No new records.")
+        return
 
     # Column names 轉成可讀的文字
     df.columns = [
@@ -161,21 +436,25 @@ def resale_flat_prices():
     df.insert(10, "Remaining Lease Months", "")
 
     # 將 "Remaining Lease" 年月拆開
-    df[["Remaining Lease Years", "Remaining Lease Months"]] = (
-        df["Remaining Lease"].str.extract(r"(\d+) years(?: (\d+) month)?").fillna(0)
+    df[["Remaining Lease Years", "Remaining Lease Months"]] = parse_remaining_lease(
+        df["Remaining Lease"]
     )
-    df["Remaining Lease Years"] = df["Remaining Lease Years"].astype(int)
-    df["Remaining Lease Months"] = df["Remaining Lease Months"].astype(int)
 
     # 移除 "Remaining Lease" 欄位
     df = df.drop(columns=["Remaining Lease"])
 
     # 存檔
-    save_df(df, "resale_flat_prices")
+    save_df(df, "resale_flat_prices", sync_state, "Month")
+
 
+def renting_out_of_flats(incremental=False):
+    df, sync_state = load_df(
+        "d_c9f57187485a850908655db0e8cfe651", "renting_out_of_flats", incremental
+    )
 
-def renting_out_of_flats():
-    df = get_df("d_c9f57187485a850908655db0e8cfe651")
+    if df.empty:
+        print("No new records.")
+        return
 
     # 取代 "0001-01"
     df = df.replace("0001-01", "", regex=False)
@@ -191,7 +470,7 @@ def renting_out_of_flats():
     ]
 
     # 存檔
-    save_df(df, "renting_out_of_flats")
+    save_df(df, "renting_out_of_flats", sync_state, "Rent Approval Date")
 
 
 def hdb_property_information():
@@ -263,8 +542,16 @@ def hdb_property_information():
     save_df(df, "hdb_property_information")
 
 
-def price_range_of_hdb_flats_offered():
-    df = get_df("d_2d493bdcc1d9a44828b6e71cb095b88d")
+def price_range_of_hdb_flats_offered(incremental=False):
+    df, sync_state = load_df(
+        "d_2d493bdcc1d9a44828b6e71cb095b88d",
+        "price_range_of_hdb_flats_offered",
+        incremental,
+    )
+
+    if df.empty:
+        print("No new records.")
+        return
 
     # 取代 "-"
     df = df.replace("-", "", regex=False)
@@ -281,7 +568,7 @@ def price_range_of_hdb_flats_offered():
     ]
 
     # 存檔
-    save_df(df, "price_range_of_hdb_flats_offered")
+    save_df(df, "price_range_of_hdb_flats_offered", sync_state, "Financial Year")
 
 
 if __name__ == "__main__":
@@ -1,11 +1,13 @@
 import os
-import requests
-from bs4 import BeautifulSoup
+import sys
 import json
-import pandas as pd
-import numpy as np
 from io import BytesIO, StringIO
-import pdfplumber
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
 
 
 class Hotel:
@@ -32,11 +34,12 @@ class Hotel:
         df = self.drop_columns(df)
 
         # 存檔
-        csv_path = f"{self.data_dir}/{name}.csv"
-        df.to_csv(csv_path, index=False)
+        csv_path = sink.write(df, f"{self.data_dir}/{name}.csv")
         print(f"Saved: {csv_path}.")
 
     def save_all(self):
+        import pandas as pd
+
         # 取得所有資料連結
         link_dict = self.get_links(get_all=True)
 
@@ -90,11 +93,12 @@ class Hotel:
         df = df.sort_values(by="年月", ascending=False, kind="stable")
 
         # 存檔
-        csv_path = f"{self.data_dir}/all.csv"
-        df.to_csv(csv_path, index=False)
+        csv_path = sink.write(df, f"{self.data_dir}/all.csv")
         print(f"Saved: {csv_path}.")
 
     def get_links(self, get_all=False):
+        from bs4 import BeautifulSoup
+
         file_page_url = f"{self.base_url}/businessinfo/FilePage?a={self.data_id}"
         link_dict = {}
         page = 1
@@ -103,7 +107,7 @@ class Hotel:
             url = f"{file_page_url}&P={page}"
             print("URL:", url)
 
-            response = requests.get(url)
+            response = fetch.get(url)
             soup = BeautifulSoup(response.text, "html.parser")
             tbody = soup.find("tbody")
             trs = tbody.find_all("tr")
@@ -167,6 +171,8 @@ class TouristHotel(Hotel):
         ]
 
     def get_df(self, url):
+        import pandas as pd
+
         # 1. 讀取excel
         try:
             df = pd.read_excel(url)
@@ -223,10 +229,13 @@ class TouristHotel(Hotel):
         return df
 
     def pdf_to_df(self, url):
+        import pandas as pd
+        import pdfplumber
+
         if "16047" in url:
             return pd.DataFrame()
 
-        response = requests.get(url)
+        response = fetch.get(url)
         pdf_file = BytesIO(response.content)
         text = ""
 
@@ -329,6 +338,8 @@ class TouristHotelReport(Hotel):
         return f"{name[:4]}-{name[4:6]}"
 
     def get_df(self, name, url):
+        import pandas as pd
+
         # 0. 檢查是否是單月資料
         if "-" in name:
             return pd.DataFrame()
@@ -379,6 +390,8 @@ class TouristHotelReport(Hotel):
         return df
 
     def get_df_main(self, df):
+        import numpy as np
+
         # 1. 刪除多餘欄位
         df = df.iloc[:, [0, 3, 5, 8, 9] + list(range(11, 29))]
 
@@ -400,6 +413,8 @@ class TouristHotelReport(Hotel):
         return df
 
     def get_df_country(self, df):
+        import numpy as np
+
         # 1. 找到初始點
         mask = df.iloc[:, 2].eq("FIT類別")
         df = df.loc[mask.idxmax() :].reset_index(drop=True)
@@ -434,6 +449,8 @@ class TouristHotelReport(Hotel):
         return df
 
     def get_old_df_main(self, df, year_month):
+        import numpy as np
+
         # 1. 刪除多餘欄位
         df = df.iloc[:, [0, 3, 5, 8, 9] + list(range(11, 19))]
 
@@ -459,6 +476,8 @@ class TouristHotelReport(Hotel):
         return df
 
     def get_old_df_country(self, df, year_month):
+        import numpy as np
+
         # 1. 找到初始點
         mask = df.iloc[:, 2].eq("FIT類別")
         df = df.loc[mask.idxmax() :].reset_index(drop=True)
@@ -527,6 +546,8 @@ class StandardHotel(Hotel):
         ]
 
     def get_df(self, url):
+        import pandas as pd
+
         # 1. 讀取excel
         try:
             df = pd.read_excel(url)
@@ -585,7 +606,10 @@ class StandardHotel(Hotel):
         return df.iloc[:, :-3]
 
     def pdf_to_df(self, url):
-        response = requests.get(url)
+        import pandas as pd
+        import pdfplumber
+
+        response = fetch.get(url)
         pdf_file = BytesIO(response.content)
         text = ""
 
@@ -731,6 +755,8 @@ class StandardHotelReport(Hotel):
         }
 
     def get_df(self, name, url):
+        import pandas as pd
+
         year = name[:4]
 
         if year >= "2017":
@@ -829,6 +855,8 @@ class HomeStay(StandardHotel):
         ]
 
     def get_df(self, url):
+        import pandas as pd
+
         # 1. 讀取excel
         try:
             df = pd.read_excel(url)
@@ -1,9 +1,13 @@
 import os
-import requests
+import sys
 from io import BytesIO
-import pandas as pd
 from datetime import datetime, timedelta
-import numpy as np
+
+sys.path.insert(
+    0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "common")
+)
+import fetch
+import sink
 
 
 class Tourism:
@@ -59,6 +63,8 @@ class Tourism:
 
     def get_df(self, year, month):
 
+        import pandas as pd
+
         # 西元年轉民國年
         year = int(year) - 1911
 
@@ -84,7 +90,7 @@ class Tourism:
             # "User-Agent": 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36'
         }
 
-        response = requests.get(url, headers=headers)
+        response = fetch.get(url, headers=headers)
 
         if response.status_code == 200:
             excel_data = BytesIO(response.content)
@@ -98,6 +104,9 @@ class Tourism:
             return pd.DataFrame()
 
     def process_df(self, df, year, month):
+        import pandas as pd
+        import numpy as np
+
         df.columns = [
             "類型",
             "觀光遊憩區",
@@ -228,8 +237,7 @@ class Tourism:
 
             # 存檔
             csv_name = f"{year}年{month:02}月主要觀光遊憩據點遊客人數.csv"
-            csv_path = os.path.join(self.data_dir, csv_name)
-            df.to_csv(csv_path, index=False)
+            csv_path = sink.write(df, os.path.join(self.data_dir, csv_name))
             print(f"Saved: {csv_path}.")
 
             # 更新checkpoint